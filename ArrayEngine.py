@@ -0,0 +1,257 @@
+# coding=utf-8
+from itertools import islice
+
+import numpy as np
+
+from Simulation import CarClass, RoadClass, CrossClass
+
+# 数组模式下的车辆状态: 所有车辆的属性保存在以车辆index为下标的NumPy数组中
+class CarArrayClass(object):
+    def __init__(self, CarTable, AnswerFlat, AnswerOffsets, CrossToIdx, CrossRoadToNext, CrossAdjacency, CrossTable):
+        '''
+        CarTable: car.txt中的车辆表, 每行为(id, from, to, speed, planTime)
+        AnswerFlat, AnswerOffsets: answer.txt中的车辆路线, 第i辆车为AnswerFlat[AnswerOffsets[i]:AnswerOffsets[i + 1]]
+        CrossTable: 路口查找表, 用于预先计算路线每一步的入口slot与转向优先级
+        其余参数与CarClass.GetRoute相同
+        '''
+        self.CarNum = len(CarTable)
+        self.Number = CarTable[:, 0].copy()
+        self.MaxVelocity = CarTable[:, 3].copy()
+        self.StartTime = AnswerFlat[AnswerOffsets[:-1] + 1]
+        self.StartCross = np.array([CrossToIdx[Cross] for Cross in CarTable[:, 1].tolist()], np.int64)
+        self.RouteFlat, self.RouteOffsets = self.GetRouteArray(CarTable, AnswerFlat, AnswerOffsets, CrossToIdx,
+                                                               CrossRoadToNext, CrossAdjacency)
+        # 与RouteFlat对齐的路口查找结果, 见CrossTableClass.GetRouteSteps
+        self.RouteCross, self.RouteExitSlot, self.RouteEntranceSlot, self.RouteTurn = \
+            CrossTable.GetRouteSteps(self.RouteFlat, self.RouteOffsets)
+        self.StartSlot = CrossTable.EntranceSlot[self.RouteFlat[self.RouteOffsets[:-1]]]
+        self.IfWait = np.ones(self.CarNum, np.bool_)
+        self.Position = np.zeros(self.CarNum, np.int64)
+        self.RoutePosition = np.zeros(self.CarNum, np.int64)
+        self.NextRoad = self.RouteFlat[self.RouteOffsets[:-1]].copy()
+        # 车辆驶向NextRoad时的入口slot与转向优先级, 随NextRoad一起更新
+        self.NextEntranceSlot = self.RouteEntranceSlot[self.RouteOffsets[:-1]].copy()
+        self.NextTurn = self.RouteTurn[self.RouteOffsets[:-1]].copy()
+        # 为True时道路内行驶阶段对所有道路批量计算, 否则逐条道路调用UpdateTerminalStateRoad;
+        # 批量计算每个时间片有固定的NumPy开销, 工作表中道路上的车辆少于VectorizedMinCars时仍逐条道路计算
+        self.Vectorized = True
+        self.VectorizedMinCars = 100
+        self.RoadLength = None
+        self.RoadMaxVelocity = None
+
+    # 记录每条道路的长度和限速, 批量计算道路内行驶时使用
+    def SetRoadArrays(self, RoadObjList):
+        self.RoadLength = np.array([RoadObj.Length for RoadObj in RoadObjList], np.int64)
+        self.RoadMaxVelocity = np.array([RoadObj.MaxVelocity for RoadObj in RoadObjList], np.int64)
+
+    # 将所有车辆的路线拼接为一个数组, 车辆i的路线为RouteFlat[RouteOffsets[i]:RouteOffsets[i + 1]]
+    @staticmethod
+    def GetRouteArray(CarTable, AnswerFlat, AnswerOffsets, CrossToIdx, CrossRoadToNext, CrossAdjacency):
+        AnswerList = AnswerFlat.tolist()
+        RouteList = [CarClass.GetRoute(Car, AnswerList[AnswerOffsets[CarIdx]:AnswerOffsets[CarIdx + 1]],
+                                       CrossToIdx, CrossRoadToNext, CrossAdjacency) \
+                     for CarIdx, Car in enumerate(CarTable.tolist())]
+        RouteOffsets = np.zeros(len(RouteList) + 1, np.int64)
+        RouteOffsets[1:] = np.cumsum([len(Route) for Route in RouteList])
+        RouteFlat = np.array([Road for Route in RouteList for Road in Route], np.int64)
+        return RouteFlat, RouteOffsets
+
+    # 更新车辆的属性RoutePosition, NextRoad, Position至下一条路径
+    def UpdateStateToNextRoad(self, Car, PositionNextRoad):
+        '''
+        Car: 车辆index
+        PositionNextRoad: 车辆在下一条路径上的位置
+        '''
+        RoutePosition = self.RoutePosition[Car] + 1
+        self.RoutePosition[Car] = RoutePosition
+        Step = self.RouteOffsets[Car] + RoutePosition
+        if Step >= self.RouteOffsets[Car + 1] - 1:
+            self.NextRoad[Car] = -1
+        else:
+            self.NextRoad[Car] = self.RouteFlat[Step + 1]
+        self.NextEntranceSlot[Car] = self.RouteEntranceSlot[Step]
+        self.NextTurn[Car] = self.RouteTurn[Step]
+        self.Position[Car] = PositionNextRoad
+
+    # 批量完成道路内行驶阶段, 结果与对每条道路执行SetAllCarWait和UpdateTerminalStateRoad相同
+    def UpdateTerminalStateRoads(self, RoadObjList, RoadIdxList):
+        '''
+        RoadIdxList: 需要更新的道路index, 通常为工作表中有车的道路
+        每个车道内的车辆按从前到后的顺序拼接为一段, 所有车道拼接成一个数组:
+        1. 车道最前方的连续阻塞车辆保持等待状态: 头车无法在本道路内走完最大速度,
+           之后的车辆被前方等待车辆挡住
+        2. 其余车辆进入终止状态, 新位置满足 NewPos[i] = min(Pos[i] + V[i], NewPos[i - 1] - 1),
+           令 Q[i] = NewPos[i] + i, 则 Q 为分段累计最小值
+        '''
+        Flat = []
+        SegLen = []
+        SegRoad = []
+        SegChannel = []
+        for RoadIdx in RoadIdxList:
+            RoadObj = RoadObjList[RoadIdx]
+            RoadObj.WaitChannels = set()
+            for ChannelIdx, Channel in enumerate(RoadObj.Cars):
+                if len(Channel):
+                    Flat.extend(reversed(Channel))
+                    SegLen.append(len(Channel))
+                    SegRoad.append(RoadIdx)
+                    SegChannel.append(ChannelIdx)
+        if len(Flat):
+            Flat = np.array(Flat, np.int64)
+            SegLen = np.array(SegLen, np.int64)
+            SegRoad = np.array(SegRoad, np.int64)
+            SegIdx = np.repeat(np.arange(len(SegLen)), SegLen)
+            SegStart = np.zeros(len(SegLen), np.int64)
+            SegStart[1:] = np.cumsum(SegLen)[:-1]
+            FlatIdx = np.arange(len(Flat))
+            LocalIdx = FlatIdx - SegStart[SegIdx]
+            IsHead = LocalIdx == 0
+
+            Position = self.Position[Flat]
+            CarRoad = SegRoad[SegIdx]
+            Reach = Position + np.minimum(self.RoadMaxVelocity[CarRoad], self.MaxVelocity[Flat])
+            # 头车与道路终点比较, 其余车辆与前车(等待状态, 位置不变)比较
+            Limit = np.where(IsHead, self.RoadLength[CarRoad], np.roll(Position, 1))
+            Blocked = Reach >= Limit
+            FirstFree = np.minimum.reduceat(np.where(Blocked, len(Flat), FlatIdx), SegStart)
+            Wait = FlatIdx < FirstFree[SegIdx]
+
+            Q = np.where(Wait, Position, Reach) + LocalIdx
+            Offset = SegIdx * (Q.max() - Q.min() + 1)
+            NewPosition = np.minimum.accumulate(Q - Offset) + Offset - LocalIdx
+
+            self.Position[Flat] = NewPosition
+            self.IfWait[Flat] = Wait
+            for Seg in np.flatnonzero(Wait[SegStart]).tolist():
+                RoadObjList[SegRoad[Seg]].WaitChannels.add(SegChannel[Seg])
+        for RoadIdx in RoadIdxList:
+            RoadObj = RoadObjList[RoadIdx]
+            RoadObj.UpdateFirstPriority()
+            if RoadObj.WaitFirstPriority != -1:
+                RoadObj.ActiveSet.Crosses.add(RoadObj.ToCross)
+
+    # 将到达出发时间的车辆放入起点路口的车库, CarIdxToStart为车辆index的出发队列
+    def AddCarToGarage(self, NowTime, CrossObjList, CarIdxToStart):
+        for Car in CarIdxToStart.PopBatch(NowTime):
+            CrossObjAdd = CrossObjList[self.StartCross[Car]]
+            CrossObjAdd.UnlimitedGarage[self.StartSlot[Car]].append(Car)
+            CrossObjAdd.GarageCarNum += 1
+            CrossObjAdd.ActiveSet.GarageCrosses.add(CrossObjAdd.CrossIdx)
+
+# 数组模式下的道路, Cars中保存车辆index
+class RoadArrayClass(RoadClass):
+    def __init__(self, Road, RoadIdx, FromCross, ToCross, ActiveSet, CarArray):
+        super(RoadArrayClass, self).__init__(Road, RoadIdx, FromCross, ToCross, ActiveSet)
+        self.CarArray = CarArray
+
+    def SetAllCarWait(self):
+        IfWait = self.CarArray.IfWait
+        # 每条道路上的车辆很少, 逐个赋值比用deque作为下标的花式索引快
+        for Channel in self.Cars:
+            for Car in Channel:
+                IfWait[Car] = True
+
+    def UpdateFirstPriority(self):
+        if len(self.WaitChannels):
+            Position = self.CarArray.Position
+            WaitChannelsList = list(self.WaitChannels)
+            WaitChannelsList.sort()
+            WaitChannelsMax = [Position[self.Cars[ChannelIdx][-1]] for ChannelIdx in WaitChannelsList]
+            self.WaitFirstPriority = WaitChannelsList[WaitChannelsMax.index(max(WaitChannelsMax))]
+        else:
+            self.WaitFirstPriority = -1
+
+    def UpdateTerminalStateChannel(self, ChannelIdx, Channel):
+        if len(Channel):
+            Position, IfWait, CarVelocity = self.CarArray.Position, self.CarArray.IfWait, self.CarArray.MaxVelocity
+            CarEnd = Channel[-1]
+            if IfWait[CarEnd]:
+                MaxVelocity = min(self.MaxVelocity, CarVelocity[CarEnd])
+                if Position[CarEnd] + MaxVelocity < self.Length:
+                    Position[CarEnd] += MaxVelocity
+                    IfWait[CarEnd] = False
+                    if ChannelIdx in self.WaitChannels:
+                        self.WaitChannels.remove(ChannelIdx)
+                else:
+                    self.WaitChannels.add(ChannelIdx)
+            elif ChannelIdx in self.WaitChannels:
+                self.WaitChannels.remove(ChannelIdx)
+
+            CarEarly = CarEnd
+            for CarLater in islice(reversed(Channel), 1, None):
+                if IfWait[CarLater]:
+                    MaxMoveDistance = Position[CarEarly] - Position[CarLater] - 1
+                    MaxVelocity = min(self.MaxVelocity, CarVelocity[CarLater])
+                    if MaxMoveDistance >= MaxVelocity:
+                        Position[CarLater] += MaxVelocity
+                        IfWait[CarLater] = False
+                    elif not IfWait[CarEarly]:
+                        Position[CarLater] += MaxMoveDistance
+                        IfWait[CarLater] = False
+                CarEarly = CarLater
+        elif ChannelIdx in self.WaitChannels:
+            self.WaitChannels.remove(ChannelIdx)
+
+# 数组模式下的路口, 车库中保存车辆index
+class CrossArrayClass(CrossClass):
+    def __init__(self, CrossTable, Cross, CrossToIdx, ActiveSet, CarArray):
+        super(CrossArrayClass, self).__init__(CrossTable, Cross, CrossToIdx, ActiveSet)
+        self.CarArray = CarArray
+
+    # 调度循环沿用CrossClass.ScheduleRoads, 这里只重写车辆状态的读写
+    def GetCarNextRoad(self, Car):
+        return self.CarArray.NextRoad[Car]
+
+    def GetCarTurn(self, Car):
+        return self.CarArray.NextEntranceSlot[Car], self.CarArray.NextTurn[Car]
+
+    def GetCarPosition(self, Car):
+        return self.CarArray.Position[Car]
+
+    def GetCarIfWait(self, Car):
+        return self.CarArray.IfWait[Car]
+
+    def GetCarNumber(self, Car):
+        return int(self.CarArray.Number[Car])
+
+    def StopCarAtRoadEnd(self, Car, Length):
+        self.CarArray.Position[Car] = Length - 1
+        self.CarArray.IfWait[Car] = False
+
+    def MoveCarToNextRoad(self, Car, Position):
+        self.CarArray.IfWait[Car] = False
+        self.CarArray.UpdateStateToNextRoad(Car, Position)
+
+    def AddCarFromGarage(self, RoadsList):
+        CarArray = self.CarArray
+        Position = CarArray.Position
+        for RoadIdx, RoadGarage in enumerate(self.UnlimitedGarage):
+            while(len(RoadGarage)):
+                CarHasAdd = False
+                RoadObj = RoadsList[self.EntranceRoads[RoadIdx]]
+                for Channel in RoadObj.Cars:
+                    if len(Channel) and Position[Channel[0]] == 0:
+                        continue
+                    Car = RoadGarage.popleft()
+                    if len(Channel):
+                        Position[Car] = min(CarArray.MaxVelocity[Car], RoadObj.MaxVelocity,
+                                            Position[Channel[0]]) - 1
+                    else:
+                        Position[Car] = min(CarArray.MaxVelocity[Car], RoadObj.MaxVelocity) - 1
+                    Channel.appendleft(Car)
+                    RoadObj.CarEnter()
+                    self.GarageCarNum -= 1
+                    CarArray.IfWait[Car] = False
+                    # 路线只有一条道路时驶入后即以终点为目标
+                    if CarArray.RouteOffsets[Car + 1] - CarArray.RouteOffsets[Car] > 1:
+                        CarArray.NextRoad[Car] = CarArray.RouteFlat[CarArray.RouteOffsets[Car] + 1]
+                    else:
+                        CarArray.NextRoad[Car] = -1
+                    CarArray.NextEntranceSlot[Car] = CarArray.RouteEntranceSlot[CarArray.RouteOffsets[Car]]
+                    CarArray.NextTurn[Car] = CarArray.RouteTurn[CarArray.RouteOffsets[Car]]
+                    CarHasAdd = True
+                    break
+                if CarHasAdd == False:
+                    break
+        if self.GarageCarNum == 0:
+            self.ActiveSet.GarageCrosses.discard(self.CrossIdx)
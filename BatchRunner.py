@@ -0,0 +1,130 @@
+# coding=utf-8
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import traceback
+
+from Loader import LoadAnswer, AnswerFromRows
+from Simulation import DeadLockError, LoadMap, FromMapToObj, RunSimulation
+
+# 工作进程共用的地图, 由InitWorker设置. fork模式下子进程直接继承父进程中已构建的地图, 不需要再次解析或复制
+WorkerMap = None
+WorkerEngine = 'object'
+WorkerUseCache = False
+
+def InitWorker(Map, Engine, UseCache):
+    global WorkerMap, WorkerEngine, WorkerUseCache
+    WorkerMap, WorkerEngine, WorkerUseCache = Map, Engine, UseCache
+
+def EvaluateInWorker(NameAndPlan):
+    return EvaluatePlan(WorkerMap, NameAndPlan[0], NameAndPlan[1], WorkerEngine, WorkerUseCache)
+
+# 在地图上运行一份Answer, 返回调度结果
+def EvaluatePlan(Map, Name, Plan, Engine='object', UseCache=False):
+    '''
+    Name: 结果中显示的名称
+    Plan: answer文件路径, 或内存中的Answer, 每个元素为(carID, StartTime, RoadID...)
+    UseCache: 是否为answer文件保存解析缓存. 候选Answer通常只评估一次, 默认不缓存
+    返回值: 字典, 各项为
+    ScheduleTime: 总调度时间, 死锁时为-1
+    TotalTravelTime: 已到达车辆的行驶时间之和, 每辆车为到达时间减去Answer中的计划出发时间, 在车库中等待的时间也计入
+    ArrivedCars: 已到达终点的车辆数
+    DeadLock: 死锁信息, 未死锁时为None
+    Error: Answer无法读取或与地图不符(如包含地图中不存在的车辆或道路)时的错误信息, 此时其余各项无意义; 正常时为None
+    WallTime: 构建调度对象与运行调度的耗时(秒)
+    '''
+    t0 = time.time()
+    # 一份Answer出错不影响同一批中的其他Answer
+    try:
+        Result = RunPlan(Map, Plan, Engine, UseCache)
+    except Exception as e:
+        traceback.print_exc()
+        Result = {'ScheduleTime': -1, 'TotalTravelTime': -1, 'ArrivedCars': 0, 'DeadLock': None,
+                  'Error': '%s: %s' % (type(e).__name__, e)}
+    return dict([('Plan', Name)] + list(Result.items()) + [('WallTime', time.time() - t0)])
+
+def RunPlan(Map, Plan, Engine, UseCache):
+    if isinstance(Plan, str):
+        AnswerFlat, AnswerOffsets = LoadAnswer(Plan, UseCache)
+    else:
+        AnswerFlat, AnswerOffsets = AnswerFromRows(Plan)
+    RoadObjList, CrossObjList, CarObjToStart, CarObjHasEnd, ActiveSet, CarArray = FromMapToObj(
+        Map, AnswerFlat, AnswerOffsets, Engine)
+    ArriveTimes = []
+    ScheduleTime, DeadLock = -1, None
+    try:
+        ScheduleTime = RunSimulation(RoadObjList, CrossObjList, CarObjToStart, CarObjHasEnd, ActiveSet, CarArray,
+                                     ArriveTimes=ArriveTimes)
+    except DeadLockError as e:
+        DeadLock = str(e)
+    return {'ScheduleTime': ScheduleTime, 'TotalTravelTime': GetTotalTravelTime(CarObjHasEnd, ArriveTimes, CarArray),
+            'ArrivedCars': len(ArriveTimes), 'DeadLock': DeadLock, 'Error': None}
+
+# 已到达车辆的行驶时间之和, ArriveTimes为RunSimulation从时间片0开始记录的到达时间
+def GetTotalTravelTime(CarObjHasEnd, ArriveTimes, CarArray=None):
+    # 死锁时只统计死锁之前完整的时间片中到达的车辆
+    CarHasArrived = CarObjHasEnd[:len(ArriveTimes)]
+    if CarArray is None:
+        StartTimeSum = sum([Car.StartTime for Car in CarHasArrived])
+    else:
+        StartTimeSum = int(CarArray.StartTime[CarHasArrived].sum())
+    return sum(ArriveTimes) - StartTimeSum
+
+# 在同一地图上并行运行多份Answer, 返回与Plans顺序相同的结果列表
+def RunBatch(Map, Plans, Engine='object', Workers=None, UseCache=False):
+    '''
+    Plans: 元素为(Name, Plan)的列表, Plan的格式见EvaluatePlan
+    Workers: 进程数, 默认为CPU核数; 为1时在当前进程中依次运行
+    UseCache: 见EvaluatePlan
+    '''
+    Workers = min(Workers or os.cpu_count() or 1, len(Plans))
+    if Workers <= 1:
+        return [EvaluatePlan(Map, Name, Plan, Engine, UseCache) for Name, Plan in Plans]
+    # 优先使用fork, 地图由子进程继承; 不支持fork的平台上地图在每个进程初始化时传入一次
+    StartMethod = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    with multiprocessing.get_context(StartMethod).Pool(Workers, InitWorker, (Map, Engine, UseCache)) as Pool:
+        return Pool.map(EvaluateInWorker, Plans, chunksize=1)
+
+def FormatTable(Results):
+    Lines = ['%-40s %12s %15s %8s %9s %9s' % ('Plan', 'ScheduleTime', 'TotalTravelTime', 'Arrived', 'DeadLock',
+                                              'WallTime')]
+    for Result in Results:
+        if Result['Error']:
+            Lines.append('%-40s Error: %s' % (Result['Plan'], Result['Error']))
+            continue
+        Lines.append('%-40s %12d %15d %8d %9s %8.2fs' % (Result['Plan'], Result['ScheduleTime'],
+                                                       Result['TotalTravelTime'], Result['ArrivedCars'],
+                                                       'Yes' if Result['DeadLock'] else 'No', Result['WallTime']))
+    return '\n'.join(Lines)
+
+
+if __name__ == '__main__':
+
+    # 例: python BatchRunner.py config_5 answer1.txt answer2.txt -j 4 --json
+    Parser = argparse.ArgumentParser(description='Evaluate several answer files against one map')
+    Parser.add_argument('FileDir', help='directory containing road.txt, cross.txt and car.txt')
+    Parser.add_argument('AnswerFiles', nargs='*', help='answer files, default FileDir/answer.txt')
+    Parser.add_argument('-j', '--workers', type=int, default=None, help='number of processes, default CPU count')
+    Parser.add_argument('--engine', default='object', choices=['object', 'array'])
+    Parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    Parser.add_argument('--no-cache', action='store_true', help='parse the text files instead of the npz cache')
+    Parser.add_argument('--cache-answers', action='store_true',
+                        help='also cache the parsed answer files, off by default since candidates are usually one-off')
+    Args = Parser.parse_args()
+
+    tStart = time.time()
+    Map = LoadMap(Args.FileDir + '/road.txt', Args.FileDir + '/cross.txt', Args.FileDir + '/car.txt',
+                  not Args.no_cache)
+    AnswerFiles = Args.AnswerFiles or [Args.FileDir + '/answer.txt']
+    Results = RunBatch(Map, [(AnswerFile, AnswerFile) for AnswerFile in AnswerFiles], Args.engine, Args.workers,
+                       Args.cache_answers and not Args.no_cache)
+    WallTime = time.time() - tStart
+
+    if Args.json:
+        print(json.dumps({'Map': Args.FileDir, 'Engine': Args.engine, 'WallTime': WallTime, 'Results': Results},
+                         indent=2))
+    else:
+        print(FormatTable(Results))
+        print('Total WallTime: %.2fs' % WallTime)
@@ -0,0 +1,173 @@
+# coding=utf-8
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # 没有resource模块的平台(Windows)上不统计峰值内存
+    resource = None
+
+from BatchRunner import GetTotalTravelTime
+from Loader import LoadAnswer
+from MapGenerator import GenerateConfig
+from Simulation import DeadLockError, LoadMap, FromMapToObj, RunSimulation, UpdateOneTick
+
+# 与基准结果比较时, 调度耗时超过基准的(1 + Tolerance)倍, 且至少多出MinDelta秒时视为变慢;
+# 只用比例判断时, 耗时只有几十毫秒的小地图会因计时噪声频繁误报
+DefaultTolerance = 0.2
+DefaultMinDelta = 0.05
+# 每个算例默认运行的次数, 取最快的一次
+DefaultRepeat = 3
+
+# 统计实际调度的时间片数, 以与InstrumentClass相同的接口传给RunSimulation;
+# 事件驱动跳过的空时间片不计入, 因此不同模式与地图的每秒时间片数可以比较
+class TickCounterClass(object):
+    def __init__(self):
+        self.Ticks = 0
+
+    def UpdateOneTick(self, *Args):
+        self.Ticks += 1
+        UpdateOneTick(*Args)
+
+    def Attach(self, *Args):
+        pass
+
+    def Detach(self):
+        pass
+
+# 解析放大算例的规格ROWSxCOLS:CARS, 返回(Rows, Cols, CarNum)
+def ParseScaleSpec(Spec):
+    Match = re.match(r'^(\d+)x(\d+):(\d+)$', Spec)
+    if Match is None:
+        raise argparse.ArgumentTypeError('expected ROWSxCOLS:CARS, got %r' % Spec)
+    return tuple([int(Value) for Value in Match.groups()])
+
+# 放大算例: 由MapGenerator生成路网与车辆同时变大的网格地图, 使路上同时行驶的车辆随规模增加;
+# 生成结果只由规格决定(固定随机种子), 已生成的地图直接复用. 返回地图目录
+def PrepareScaledMap(Rows, Cols, CarNum, MapDir):
+    FileDir = os.path.join(MapDir, 'grid%dx%d_%d' % (Rows, Cols, CarNum))
+    if not all([os.path.exists(os.path.join(FileDir, Name)) for Name in ['road.txt', 'cross.txt', 'car.txt',
+                                                                          'answer.txt']]):
+        GenerateConfig(FileDir, Rows, Cols, CarNum)
+    return FileDir
+
+# 运行一个算例, 返回各项指标. 读取与构建的耗时计入LoadTime, 多次运行时取最小值;
+# TicksPerSecond为实际调度的时间片数SimulatedTicks除以SimTime, 不含事件驱动跳过的时间片
+def RunCase(FileDir, Engine='object', Repeat=DefaultRepeat, UseCache=True):
+    LoadTimes, SimTimes = [], []
+    for _ in range(Repeat):
+        t0 = time.perf_counter()
+        Map = LoadMap(FileDir + '/road.txt', FileDir + '/cross.txt', FileDir + '/car.txt', UseCache)
+        AnswerFlat, AnswerOffsets = LoadAnswer(FileDir + '/answer.txt', UseCache)
+        State = FromMapToObj(Map, AnswerFlat, AnswerOffsets, Engine)
+        t1 = time.perf_counter()
+        ArriveTimes = []
+        DeadLock = None
+        TickCounter = TickCounterClass()
+        try:
+            ScheduleTime = RunSimulation(*State, ArriveTimes=ArriveTimes, Instrument=TickCounter)
+        except DeadLockError as e:
+            ScheduleTime, DeadLock = e.NowTime, str(e)
+        t2 = time.perf_counter()
+        LoadTimes.append(t1 - t0)
+        SimTimes.append(t2 - t1)
+    PeakMemory = None
+    if resource is not None:
+        # Linux下ru_maxrss的单位为KB, macOS下为字节
+        PeakMemory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / \
+                     (1024.0 ** 2 if sys.platform == 'darwin' else 1024.0)
+    return {'Name': FileDir, 'Engine': Engine,
+            'Cars': len(Map.CarTable), 'LoadTime': min(LoadTimes), 'SimTime': min(SimTimes),
+            'SimulatedTicks': TickCounter.Ticks, 'TicksPerSecond': TickCounter.Ticks / max(min(SimTimes), 1e-9),
+            'PeakMemoryMB': PeakMemory,
+            'ScheduleTime': ScheduleTime, 'TotalTravelTime': GetTotalTravelTime(State[3], ArriveTimes, State[5]),
+            'DeadLock': DeadLock}
+
+# 在新的进程中运行一个算例, 使峰值内存只包含该算例
+def RunCaseIsolated(*Args):
+    with multiprocessing.get_context('spawn').Pool(1) as Pool:
+        return Pool.apply(RunCase, Args)
+
+# 与基准结果比较, 返回需要提示的问题列表
+def CompareWithBaseline(Result, BaselineResult, Tolerance=DefaultTolerance, MinDelta=DefaultMinDelta):
+    Problems = []
+    for Key in ['ScheduleTime', 'TotalTravelTime', 'DeadLock']:
+        if Result[Key] != BaselineResult[Key]:
+            Problems.append('RESULT CHANGED: %s %s -> %s' % (Key, BaselineResult[Key], Result[Key]))
+    for Key in ['SimTime', 'LoadTime']:
+        if Result[Key] > BaselineResult[Key] * (1 + Tolerance) and Result[Key] - BaselineResult[Key] >= MinDelta:
+            Problems.append('SLOWER: %s %.3fs -> %.3fs' % (Key, BaselineResult[Key], Result[Key]))
+    return Problems
+
+def FormatTable(Results):
+    Lines = ['%-28s %-7s %8s %9s %9s %9s %10s %9s %12s %s' % ('Name', 'Engine', 'Cars', 'LoadTime', 'SimTime',
+                                                              'SimTicks', 'Ticks/s', 'PeakMB', 'ScheduleTime', 'Notes')]
+    for Result in Results:
+        PeakMemory = '-' if Result['PeakMemoryMB'] is None else '%.1f' % Result['PeakMemoryMB']
+        Notes = (['DeadLock'] if Result['DeadLock'] else []) + Result.get('Problems', [])
+        Lines.append('%-28s %-7s %8d %8.3fs %8.3fs %9d %10.0f %9s %12d %s' % (
+            Result['Name'], Result['Engine'], Result['Cars'], Result['LoadTime'], Result['SimTime'],
+            Result['SimulatedTicks'], Result['TicksPerSecond'], PeakMemory, Result['ScheduleTime'], '; '.join(Notes)))
+    return '\n'.join(Lines)
+
+
+if __name__ == '__main__':
+
+    # 例: python Benchmark.py --scale 20x20:20000 --save-baseline, 之后以相同参数运行与保存的基准比较
+    Parser = argparse.ArgumentParser(description='Benchmark the simulator on the bundled maps')
+    Parser.add_argument('FileDirs', nargs='*', help='map directories, default all config_*')
+    Parser.add_argument('--engine', default='object', choices=['object', 'array', 'both'])
+    Parser.add_argument('--repeat', type=int, default=DefaultRepeat, help='runs per case, the fastest is reported')
+    Parser.add_argument('--scale', nargs='+', type=ParseScaleSpec, default=[], metavar='ROWSxCOLS:CARS',
+                        help='also run generated grid maps of these sizes, e.g. 20x20:20000 30x30:50000')
+    Parser.add_argument('--map-dir', default='BenchmarkMaps', help='where the --scale maps are generated and reused')
+    Parser.add_argument('--baseline', default='BenchmarkBaseline.json', help='baseline file')
+    Parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    Parser.add_argument('--tolerance', type=float, default=DefaultTolerance, help='allowed slowdown, 0.2 = 20%%')
+    Parser.add_argument('--min-delta', type=float, default=DefaultMinDelta,
+                        help='smallest slowdown in seconds reported as SLOWER')
+    Parser.add_argument('--no-isolate', action='store_true', help='run in this process, peak memory is cumulative')
+    Parser.add_argument('--no-cache', action='store_true', help='parse the text files instead of the npz cache')
+    Parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    Args = Parser.parse_args()
+
+    FileDirs = Args.FileDirs or sorted(glob.glob('config_*'))
+    Engines = ['object', 'array'] if Args.engine == 'both' else [Args.engine]
+    Run = RunCase if Args.no_isolate else RunCaseIsolated
+    try:
+        FileDirs = FileDirs + [PrepareScaledMap(Rows, Cols, CarNum, Args.map_dir) for Rows, Cols, CarNum in Args.scale]
+    except ValueError as e:
+        Parser.error(str(e))
+    Results = []
+    for FileDir in FileDirs:
+        for Engine in Engines:
+            Results.append(Run(FileDir, Engine, Args.repeat, not Args.no_cache))
+
+    Baseline = {}
+    if os.path.exists(Args.baseline) and not Args.save_baseline:
+        with open(Args.baseline) as f:
+            Baseline = dict([((Result['Name'], Result['Engine']), Result) for Result in json.load(f)['Results']])
+    HasProblem = False
+    for Result in Results:
+        BaselineResult = Baseline.get((Result['Name'], Result['Engine']))
+        if BaselineResult is not None:
+            Result['Problems'] = CompareWithBaseline(Result, BaselineResult, Args.tolerance, Args.min_delta)
+            HasProblem = HasProblem or len(Result['Problems']) > 0
+    if Args.save_baseline:
+        with open(Args.baseline, 'w') as f:
+            json.dump({'Results': Results}, f, indent=2)
+
+    if Args.json:
+        print(json.dumps({'Results': Results}, indent=2))
+    else:
+        print(FormatTable(Results))
+        if Baseline:
+            print('Compared with %s: %s' % (Args.baseline, 'problems found' if HasProblem else 'OK'))
+    sys.exit(1 if HasProblem else 0)
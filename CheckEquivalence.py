@@ -0,0 +1,74 @@
+# coding=utf-8
+import glob
+import sys
+
+from Simulation import DeadLockError, FromFileToObj, UpdateAllRoads, ScheduleAllCrosses, AddAllCarsFromGarage
+
+# 记录道路内行驶阶段结束后的车辆与道路状态
+def GetRoadUpdateState(RoadObjList, ActiveSet, CarArray):
+    RoadState = [(RoadIdx, set(RoadObjList[RoadIdx].WaitChannels), RoadObjList[RoadIdx].WaitFirstPriority) \
+                 for RoadIdx in sorted(ActiveSet.Roads)]
+    return CarArray.Position.copy(), CarArray.IfWait.copy(), RoadState, set(ActiveSet.Crosses)
+
+# 在同一状态上分别执行标量与批量的道路内行驶阶段, 比较两者的结果, 最终保留批量计算的结果
+def CompareRoadUpdate(RoadObjList, ActiveSet, CarArray):
+    Position, IfWait = CarArray.Position.copy(), CarArray.IfWait.copy()
+    ActiveCrosses = set(ActiveSet.Crosses)
+
+    CarArray.Vectorized = False
+    UpdateAllRoads(RoadObjList, ActiveSet, CarArray)
+    ScalarState = GetRoadUpdateState(RoadObjList, ActiveSet, CarArray)
+
+    CarArray.Position[:] = Position
+    CarArray.IfWait[:] = IfWait
+    ActiveSet.Crosses = ActiveCrosses
+    CarArray.Vectorized = True
+    # 车辆较少时UpdateAllRoads仍逐条道路计算, 比较时始终使用批量计算
+    VectorizedMinCars, CarArray.VectorizedMinCars = CarArray.VectorizedMinCars, 0
+    UpdateAllRoads(RoadObjList, ActiveSet, CarArray)
+    VectorState = GetRoadUpdateState(RoadObjList, ActiveSet, CarArray)
+    CarArray.VectorizedMinCars = VectorizedMinCars
+
+    return (ScalarState[0] == VectorState[0]).all() and (ScalarState[1] == VectorState[1]).all() and \
+           ScalarState[2:] == VectorState[2:]
+
+# 逐时间片运行一个地图, 返回总调度时间, 死锁信息以及第一个批量计算结果不一致的时间片
+def RunConfig(FileDir, Engine, CheckRoadUpdate=False):
+    RoadObjList, CrossObjList, CarObjToStart, CarObjHasEnd, ActiveSet, CarArray = FromFileToObj(
+        FileDir + '/road.txt', FileDir + '/cross.txt', FileDir + '/car.txt', FileDir + '/answer.txt', Engine)
+    CarNum = len(CarObjToStart)
+    NowTime = 0
+    try:
+        while(len(CarObjHasEnd) < CarNum):
+            if len(CarObjToStart) + len(CarObjHasEnd) == CarNum:
+                NowTime = max(NowTime, CarObjToStart.NextStartTime())
+            if CheckRoadUpdate:
+                if not CompareRoadUpdate(RoadObjList, ActiveSet, CarArray):
+                    return NowTime, None, NowTime
+            else:
+                UpdateAllRoads(RoadObjList, ActiveSet, CarArray)
+            ScheduleAllCrosses(RoadObjList, CrossObjList, CarObjHasEnd, ActiveSet)
+            AddAllCarsFromGarage(NowTime, RoadObjList, CrossObjList, CarObjToStart, ActiveSet, CarArray)
+            NowTime += 1
+    except DeadLockError as e:
+        return NowTime, str(e), None
+    return NowTime, None, None
+
+
+if __name__ == '__main__':
+
+    # 对每个地图比较: 批量与标量道路内行驶阶段每个时间片的结果, 以及数组模式与对象模式的调度结果
+    FileDirs = sys.argv[1:] if len(sys.argv) > 1 else sorted(glob.glob('config_*'))
+    AllMatch = True
+    for FileDir in FileDirs:
+        ObjectResult = RunConfig(FileDir, 'object')
+        ArrayResult = RunConfig(FileDir, 'array', CheckRoadUpdate=True)
+        Match = ArrayResult[2] is None and ObjectResult[:2] == ArrayResult[:2]
+        AllMatch = AllMatch and Match
+        if ArrayResult[2] is not None:
+            print(FileDir, 'MISMATCH at tick', ArrayResult[2])
+        elif not Match:
+            print(FileDir, 'MISMATCH', ObjectResult[:2], ArrayResult[:2])
+        else:
+            print(FileDir, 'OK', ObjectResult[0], 'DeadLock' if ObjectResult[1] else '')
+    sys.exit(0 if AllMatch else 1)
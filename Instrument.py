@@ -0,0 +1,179 @@
+# coding=utf-8
+import csv
+import json
+import time
+from collections import Counter
+
+from Simulation import UpdateAllRoads, ScheduleAllCrosses, AddAllCarsFromGarage
+
+# 调度过程的性能统计: 每个时间片各阶段的耗时与内部事件计数, 以及最热的路口与道路
+# 计数通过替换道路, 路口与等待图实例上的方法实现, 不使用时调度代码没有任何额外开销;
+# RunSimulation开始时替换一次, 结束或Close时恢复原来的方法, 也可以用with语句在结束时调用Close
+class InstrumentClass(object):
+    # 每个时间片记录的字段
+    TraceFields = ['NowTime', 'RoadTime', 'CrossTime', 'GarageTime', 'CrossPasses', 'CarUpdates', 'CarEnters',
+                   'Blocks', 'FirstPriorityCalls', 'Arrived', 'ActiveRoads', 'GarageCrosses']
+
+    def __init__(self, TraceFile=None, TopNum=10):
+        '''
+        TraceFile: 不为None时每个时间片写一行记录, 文件名以.jsonl结尾时为JSON Lines格式, 否则为CSV
+        TopNum: Summary中列出的最热路口与道路数
+        各计数的含义:
+        CrossPasses: 路口调用ScheduleRoads的次数, 即路口调度的轮数之和
+        CarUpdates: 路口调度中车辆驶离道路(CarLeave)或停在道路末端(StopCarAtRoadEnd)的次数
+        CarEnters: 车辆从路口或车库驶入道路的次数
+        Blocks: 车辆因下一条道路的车道末尾有等待车辆而无法驶入的次数
+        FirstPriorityCalls: UpdateFirstPriority的调用次数
+        '''
+        self.TopNum = TopNum
+        self.RoadObjList = None
+        self.CrossObjList = None
+        # 被替换的方法, 元素为(对象, 方法名, 替换前实例上的同名属性), 为空时没有替换任何方法
+        self.Originals = []
+        # 当前时间片的计数与全部时间片的累计
+        self.Tick = Counter()
+        self.Total = Counter()
+        self.TickNum = 0
+        # 按路口编号统计的调度次数与耗时, 按道路index统计的驶入与阻塞次数
+        self.CrossPasses = Counter()
+        self.CrossTime = Counter()
+        self.RoadEnters = Counter()
+        self.RoadBlocks = Counter()
+
+        self.TraceFile = None
+        self.TraceWriter = None
+        if TraceFile is not None:
+            self.TraceFile = open(TraceFile, 'w', newline='')
+            if not TraceFile.endswith('.jsonl'):
+                self.TraceWriter = csv.DictWriter(self.TraceFile, self.TraceFields)
+                self.TraceWriter.writeheader()
+
+    # 替换调度对象上的方法, 在调用原方法的同时计数
+    def Attach(self, RoadObjList, CrossObjList, ActiveSet):
+        self.Detach()
+        self.RoadObjList, self.CrossObjList = RoadObjList, CrossObjList
+        for RoadObj in RoadObjList:
+            self.Replace(RoadObj, 'CarEnter', self.CountCalls(RoadObj.CarEnter, 'CarEnters', self.RoadEnters,
+                                                              RoadObj.RoadIdx))
+            self.Replace(RoadObj, 'CarLeave', self.CountCalls(RoadObj.CarLeave, 'CarUpdates'))
+            self.Replace(RoadObj, 'UpdateFirstPriority', self.CountCalls(RoadObj.UpdateFirstPriority,
+                                                                         'FirstPriorityCalls'))
+        for CrossObj in CrossObjList:
+            self.Replace(CrossObj, 'ScheduleRoads', self.TimeCalls(CrossObj.ScheduleRoads, CrossObj.CrossNum))
+            self.Replace(CrossObj, 'StopCarAtRoadEnd', self.CountCalls(CrossObj.StopCarAtRoadEnd, 'CarUpdates'))
+        WaitForGraph = ActiveSet.WaitForGraph
+        self.Replace(WaitForGraph, 'AddBlock', self.CountCalls(WaitForGraph.AddBlock, 'Blocks', self.RoadBlocks))
+
+    def Replace(self, Obj, Name, Wrapper):
+        self.Originals.append((Obj, Name, Obj.__dict__.get(Name)))
+        setattr(Obj, Name, Wrapper)
+
+    # 恢复Attach替换的方法, 之后在同一组调度对象上运行没有额外开销
+    def Detach(self):
+        for Obj, Name, Original in reversed(self.Originals):
+            if Original is None:
+                delattr(Obj, Name)
+            else:
+                setattr(Obj, Name, Original)
+        self.Originals = []
+
+    def CountCalls(self, Method, Key, PerObject=None, ObjectKey=None):
+        '''
+        PerObject: 不为None时同时按对象计数, ObjectKey为None时以方法的第一个参数作为对象
+        '''
+        Tick = self.Tick
+        if PerObject is None:
+            def Wrapper(*Args):
+                Tick[Key] += 1
+                return Method(*Args)
+        elif ObjectKey is None:
+            def Wrapper(*Args):
+                Tick[Key] += 1
+                PerObject[Args[0]] += 1
+                return Method(*Args)
+        else:
+            def Wrapper(*Args):
+                Tick[Key] += 1
+                PerObject[ObjectKey] += 1
+                return Method(*Args)
+        return Wrapper
+
+    def TimeCalls(self, Method, CrossNum):
+        Tick, CrossPasses, CrossTime = self.Tick, self.CrossPasses, self.CrossTime
+        def Wrapper(*Args):
+            t0 = time.perf_counter()
+            Result = Method(*Args)
+            CrossTime[CrossNum] += time.perf_counter() - t0
+            CrossPasses[CrossNum] += 1
+            Tick['CrossPasses'] += 1
+            return Result
+        return Wrapper
+
+    # 与Simulation.UpdateOneTick相同, 同时记录每个阶段的耗时, 调用前需要Attach
+    def UpdateOneTick(self, NowTime, RoadObjList, CrossObjList, CarObjToStart, CarObjHasEnd, ActiveSet, CarArray=None):
+        Tick = self.Tick
+        Tick.clear()
+        try:
+            t0 = time.perf_counter()
+            UpdateAllRoads(RoadObjList, ActiveSet, CarArray)
+            t1 = time.perf_counter()
+            Tick['RoadTime'] = t1 - t0
+            ScheduleAllCrosses(RoadObjList, CrossObjList, CarObjHasEnd, ActiveSet)
+            t2 = time.perf_counter()
+            Tick['CrossTime'] = t2 - t1
+            AddAllCarsFromGarage(NowTime, RoadObjList, CrossObjList, CarObjToStart, ActiveSet, CarArray)
+            Tick['GarageTime'] = time.perf_counter() - t2
+        finally:
+            # 发生死锁时同样记录该时间片已完成的部分
+            Tick['Arrived'] = len(CarObjHasEnd)
+            Tick['ActiveRoads'] = len(ActiveSet.Roads)
+            Tick['GarageCrosses'] = len(ActiveSet.GarageCrosses)
+            self.EndTick(NowTime)
+
+    def EndTick(self, NowTime):
+        self.TickNum += 1
+        self.Total.update(self.Tick)
+        if self.TraceFile is not None:
+            Row = dict([(Key, self.Tick[Key]) for Key in self.TraceFields])
+            Row['NowTime'] = NowTime
+            if self.TraceWriter is None:
+                self.TraceFile.write(json.dumps(Row) + '\n')
+            else:
+                self.TraceWriter.writerow(Row)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *Args):
+        self.Close()
+
+    def Close(self):
+        self.Detach()
+        if self.TraceFile is not None:
+            self.TraceFile.close()
+            self.TraceFile = None
+
+    def RoadName(self, RoadIdx):
+        RoadObj = self.RoadObjList[RoadIdx]
+        return '%d(%d->%d)' % (RoadObj.RoadNum, self.CrossObjList[RoadObj.FromCross].CrossNum,
+                               self.CrossObjList[RoadObj.ToCross].CrossNum)
+
+    # 返回统计结果的文本
+    def Summary(self):
+        Total = self.Total
+        PhaseTime = Total['RoadTime'] + Total['CrossTime'] + Total['GarageTime']
+        Lines = ['Ticks: %d, PhaseTime: %.3fs' % (self.TickNum, PhaseTime)]
+        for Key in ['RoadTime', 'CrossTime', 'GarageTime']:
+            Lines.append('  %-12s %9.3fs %6.1f%%' % (Key, Total[Key], 100.0 * Total[Key] / max(PhaseTime, 1e-12)))
+        for Key in ['CrossPasses', 'CarUpdates', 'CarEnters', 'Blocks', 'FirstPriorityCalls']:
+            Lines.append('  %-18s %d' % (Key, Total[Key]))
+        Lines.append('Hottest crosses (time, passes):')
+        for CrossNum, CrossTime in self.CrossTime.most_common(self.TopNum):
+            Lines.append('  %-8d %9.3fs %d' % (CrossNum, CrossTime, self.CrossPasses[CrossNum]))
+        Lines.append('Busiest roads (cars entered):')
+        for RoadIdx, Num in self.RoadEnters.most_common(self.TopNum):
+            Lines.append('  %-16s %d' % (self.RoadName(RoadIdx), Num))
+        Lines.append('Most blocked roads (blocks):')
+        for RoadIdx, Num in self.RoadBlocks.most_common(self.TopNum):
+            Lines.append('  %-16s %d' % (self.RoadName(RoadIdx), Num))
+        return '\n'.join(Lines)
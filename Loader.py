@@ -0,0 +1,108 @@
+# coding=utf-8
+import os
+import re
+import tempfile
+import zipfile
+import zlib
+
+import numpy as np
+
+# 缓存文件格式版本, 解析规则变化时递增, 使旧缓存失效
+CacheVersion = 1
+
+# 解析由(a, b, c, ...)形式的元组组成的文本, 返回所有整数拼接成的数组以及每行的起始位置
+def ParseTupleText(Data):
+    '''
+    Data: 文件内容(bytes), 以#开头的内容为注释
+    返回值:
+    Values: 所有行的整数按顺序拼接成的一维数组
+    Offsets: 第i行的整数为Values[Offsets[i]:Offsets[i + 1]]
+    '''
+    Data = re.sub(b'#[^\n]*', b'', Data).translate(None, b'() \t\r')
+    Lines = [Line for Line in Data.split(b'\n') if Line]
+    Offsets = np.zeros(len(Lines) + 1, np.int64)
+    if len(Lines) == 0:
+        return np.zeros(0, np.int64), Offsets
+    Offsets[1:] = np.cumsum([Line.count(b',') + 1 for Line in Lines])
+    Values = np.fromstring(b','.join(Lines), dtype=np.int64, sep=',')
+    if len(Values) != Offsets[-1]:
+        raise ValueError('Malformed tuple file, expected %d integers but parsed %d' % (Offsets[-1], len(Values)))
+    return Values, Offsets
+
+# 缓存文件与源文件放在同一目录, 以源文件的大小和修改时间作为缓存的键
+def GetCachePath(FileName):
+    return FileName + '.cache.npz'
+
+def GetCacheKey(FileName):
+    Stat = os.stat(FileName)
+    return np.array([CacheVersion, Stat.st_size, Stat.st_mtime_ns], np.int64)
+
+def LoadCache(FileName):
+    CachePath = GetCachePath(FileName)
+    if not os.path.exists(CachePath):
+        return None
+    try:
+        with np.load(CachePath) as Cache:
+            if not np.array_equal(Cache['Key'], GetCacheKey(FileName)):
+                return None
+            return Cache['Values'].astype(np.int64), Cache['Offsets'].astype(np.int64)
+    except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile, zlib.error):
+        # 缓存文件损坏(如写入时被中断)时视为未命中, 删除后由SaveCache重新生成
+        try:
+            os.remove(CachePath)
+        except OSError:
+            pass
+        return None
+
+def SaveCache(FileName, Values, Offsets):
+    # 数值范围允许时以int32保存, 减小缓存体积
+    if len(Values) == 0 or (Values.min() >= np.iinfo(np.int32).min and Values.max() <= np.iinfo(np.int32).max):
+        Values = Values.astype(np.int32)
+    CachePath = GetCachePath(FileName)
+    # 每次写入使用同目录下唯一的临时文件, 多个进程同时写缓存时互不覆盖, os.replace保证替换是原子的
+    try:
+        Handle, TempPath = tempfile.mkstemp(prefix=os.path.basename(CachePath) + '.',
+                                            suffix='.tmp', dir=os.path.dirname(CachePath) or '.')
+    except OSError:
+        # 目录不可写时只是不使用缓存
+        return
+    try:
+        with os.fdopen(Handle, 'wb') as f:
+            np.savez(f, Key=GetCacheKey(FileName), Values=Values, Offsets=Offsets)
+        os.replace(TempPath, CachePath)
+    except OSError:
+        if os.path.exists(TempPath):
+            os.remove(TempPath)
+
+# 读取元组文件, 优先使用未过期的缓存
+def LoadTupleFile(FileName, UseCache=True):
+    if UseCache:
+        Cached = LoadCache(FileName)
+        if Cached is not None:
+            return Cached
+    with open(FileName, 'rb') as f:
+        Values, Offsets = ParseTupleText(f.read())
+    if UseCache:
+        SaveCache(FileName, Values, Offsets)
+    return Values, Offsets
+
+# 读取每行长度相同的表格文件(car.txt, road.txt, cross.txt), 返回二维整数数组
+def LoadTable(FileName, UseCache=True):
+    Values, Offsets = LoadTupleFile(FileName, UseCache)
+    Width = np.diff(Offsets)
+    if len(Width) == 0:
+        return np.zeros((0, 0), np.int64)
+    if (Width != Width[0]).any():
+        raise ValueError('Rows of different lengths in ' + FileName)
+    return Values.reshape(-1, Width[0])
+
+# 读取answer.txt, 每行为(carID, StartTime, RoadID...), 长度不定, 返回拼接后的数组及每行的起始位置
+def LoadAnswer(FileName, UseCache=True):
+    return LoadTupleFile(FileName, UseCache)
+
+# 将内存中的Answer转换为与LoadAnswer相同的格式, Rows的每个元素为(carID, StartTime, RoadID...)
+def AnswerFromRows(Rows):
+    Offsets = np.zeros(len(Rows) + 1, np.int64)
+    Offsets[1:] = np.cumsum([len(Row) for Row in Rows])
+    Values = np.array([Value for Row in Rows for Value in Row], np.int64)
+    return Values, Offsets
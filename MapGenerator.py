@@ -0,0 +1,259 @@
+# coding=utf-8
+import argparse
+import heapq
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+# 生成的路口, 道路与车辆编号的起始值, 与自带地图相同
+CrossIdBase, RoadIdBase, CarIdBase = 1, 5000, 10000
+# 路口四个方向在cross.txt中的位置, 与自带地图相同按顺时针排列
+East, South, West, North = 0, 1, 2, 3
+
+# 将'4-8'形式的参数解析为(4, 8), 单个数字解析为上下限相同的范围
+def ParseRange(Text):
+    Values = [int(Value) for Value in str(Text).split('-')]
+    return Values[0], Values[-1]
+
+# 生成网格地图或随机平面地图的道路与路口
+def GenerateRoads(Rows, Cols, Rng, Topology='grid', RemoveRatio=0.3, DuplexRatio=1.0, LengthRange=(10, 20),
+                  SpeedRange=(4, 8), ChannelRange=(1, 3)):
+    '''
+    Topology: 'grid'为完整的Rows x Cols网格;
+              'random'为随机平面地图: 网格的一棵随机生成树加上其余每条边以(1 - RemoveRatio)的概率保留
+    DuplexRatio: 双向道路所占的比例, 单向道路的方向随机
+    LengthRange, SpeedRange, ChannelRange: 道路长度, 限速与车道数的范围(含两端)
+    返回值:
+    Roads: 列表, 元素为(id, length, speed, channel, from, to, isDuplex)
+    Crosses: 列表, 元素为(id, 东, 南, 西, 北方向的道路id), 没有道路的方向为-1
+    '''
+    CrossNum = Rows * Cols
+    # 网格的边, (a, b, 方向)表示b在a的东侧或南侧
+    Edges = [(r * Cols + c, r * Cols + c + 1, East) for r in range(Rows) for c in range(Cols - 1)] + \
+            [(r * Cols + c, (r + 1) * Cols + c, South) for r in range(Rows - 1) for c in range(Cols)]
+    if Topology == 'random':
+        # 按随机顺序用并查集选出生成树, 保证地图连通
+        Parent = list(range(CrossNum))
+        def Find(Cross):
+            while Parent[Cross] != Cross:
+                Parent[Cross] = Parent[Parent[Cross]]
+                Cross = Parent[Cross]
+            return Cross
+        Keep = []
+        for EdgeIdx in Rng.permutation(len(Edges)).tolist():
+            Root0, Root1 = Find(Edges[EdgeIdx][0]), Find(Edges[EdgeIdx][1])
+            if Root0 != Root1:
+                Parent[Root0] = Root1
+                Keep.append(EdgeIdx)
+            elif Rng.random() >= RemoveRatio:
+                Keep.append(EdgeIdx)
+        Edges = [Edges[EdgeIdx] for EdgeIdx in sorted(Keep)]
+    elif Topology != 'grid':
+        raise ValueError('Unknown topology: ' + str(Topology))
+
+    Roads = []
+    Crosses = [[CrossIdBase + Cross, -1, -1, -1, -1] for Cross in range(CrossNum)]
+    for RoadIdx, (Cross0, Cross1, Direction) in enumerate(Edges):
+        RoadId = RoadIdBase + RoadIdx
+        IsDuplex = int(Rng.random() < DuplexRatio)
+        From, To = (Cross0, Cross1) if IsDuplex or Rng.random() < 0.5 else (Cross1, Cross0)
+        Roads.append((RoadId, int(Rng.integers(LengthRange[0], LengthRange[1] + 1)),
+                      int(Rng.integers(SpeedRange[0], SpeedRange[1] + 1)),
+                      int(Rng.integers(ChannelRange[0], ChannelRange[1] + 1)),
+                      CrossIdBase + From, CrossIdBase + To, IsDuplex))
+        Crosses[Cross0][1 + Direction] = RoadId
+        Crosses[Cross1][1 + (Direction + 2) % 4] = RoadId
+    return Roads, [tuple(Cross) for Cross in Crosses]
+
+# 由生成的道路构建邻接表, 权重为道路长度/限速
+def GetAdjacency(Roads, CrossNum):
+    Adjacency = [[] for _ in range(CrossNum)]
+    for RoadId, Length, Speed, _, From, To, IsDuplex in Roads:
+        Weight = float(Length) / Speed
+        Adjacency[From - CrossIdBase].append((To - CrossIdBase, RoadId, Weight))
+        if IsDuplex:
+            Adjacency[To - CrossIdBase].append((From - CrossIdBase, RoadId, Weight))
+    return Adjacency
+
+# 邻接表上的Dijkstra最短路径, 以起点为单位缓存最短路径树
+class ShortestPathClass(object):
+    def __init__(self, Adjacency, CacheSize=1024):
+        '''
+        Adjacency: Adjacency[i]为从路口index i出发的边的列表, 每条边为(终点路口index, 道路id, 权重), 权重为正数
+        CacheSize: 最多缓存的最短路径树数量, 每棵树占用O(CrossNum)的内存
+        '''
+        self.CrossNum = len(Adjacency)
+        self.Adjacency = Adjacency
+        self.CacheSize = CacheSize
+        self.Trees = OrderedDict()
+
+    # 从From出发的最短路径树
+    def GetTree(self, From, Targets=None):
+        '''
+        Targets: 不为None时只需要到这些路口的路径, 它们的距离全部确定后提前结束, 结果不缓存
+        返回值:
+        Distance: 每个路口的最短距离, 不可达(或提前结束时尚未确定)为inf
+        PredCross, PredRoad: 每个路口的前驱路口与前驱道路, 不可达时为-1
+        '''
+        if Targets is None and From in self.Trees:
+            self.Trees.move_to_end(From)
+            return self.Trees[From]
+        Distance = [float('inf')] * self.CrossNum
+        PredCross = [-1] * self.CrossNum
+        PredRoad = [-1] * self.CrossNum
+        Remaining = None if Targets is None else set(Targets)
+        # 内层循环每棵树执行O(道路数)次, 用局部变量避免属性查找
+        Adjacency, HeapPush, HeapPop = self.Adjacency, heapq.heappush, heapq.heappop
+        Distance[From] = 0.0
+        Heap = [(0.0, From)]
+        while Heap:
+            Dist, Cross = HeapPop(Heap)
+            if Dist > Distance[Cross]:
+                continue
+            if Remaining is not None:
+                Remaining.discard(Cross)
+                if not Remaining:
+                    break
+            for NextCross, RoadId, Weight in Adjacency[Cross]:
+                NextDist = Dist + Weight
+                if NextDist < Distance[NextCross]:
+                    Distance[NextCross] = NextDist
+                    PredCross[NextCross] = Cross
+                    PredRoad[NextCross] = RoadId
+                    HeapPush(Heap, (NextDist, NextCross))
+        if Targets is not None:
+            return Distance, PredCross, PredRoad
+        # 缓存的树以数组保存, 减小内存
+        Tree = (np.array(Distance), np.array(PredCross, np.int32), np.array(PredRoad, np.int32))
+        self.Trees[From] = Tree
+        if len(self.Trees) > self.CacheSize:
+            self.Trees.popitem(last=False)
+        return Tree
+
+    # 返回路口index From到To的道路id列表, 不可达时返回None
+    def GetPath(self, From, To):
+        _, PredCross, PredRoad = self.GetTree(From)
+        return self.TracePath(From, To, PredCross, PredRoad)
+
+    # 从From到多个终点的路线, 返回与Targets顺序相同的(道路id列表, 距离)列表, 不可达的终点为(None, inf)
+    def GetPaths(self, From, Targets):
+        Distance, PredCross, PredRoad = self.GetTree(From, Targets)
+        return [(self.TracePath(From, To, PredCross, PredRoad), Distance[To]) for To in Targets]
+
+    @staticmethod
+    def TracePath(From, To, PredCross, PredRoad):
+        if From == To or PredRoad[To] < 0:
+            return None
+        Path = []
+        while To != From:
+            Path.append(int(PredRoad[To]))
+            To = int(PredCross[To])
+        return Path[::-1]
+
+# 为一辆车重新抽取起点与终点的最多次数, 超过时认为地图上几乎没有可达的路口对
+MaxResample = 1000
+
+# 逐批生成车辆及其最短路径Answer并写入文件, 不在内存中保存全部车辆
+def WriteCars(CarFile, AnswerFile, Paths, CarNum, Rng, SpeedRange=(2, 8), Departure='uniform', Rate=1.0,
+              ChunkSize=10000):
+    '''
+    Paths: ShortestPathClass
+    Departure: 'uniform'时计划出发时间在[1, CarNum / Rate]内均匀分布; 'poisson'时相邻车辆的出发间隔服从均值为1 / Rate的指数分布
+    Rate: 平均每个时间片出发的车辆数, 越小路网越稀疏, 越不容易死锁
+    每辆车在计划出发时间出发, 起点与终点不同且可达; 地图没有道路, 或一辆车重新抽取MaxResample次后
+    仍不可达时抛出ValueError
+    '''
+    if CarNum > 0 and not any([len(Roads) for Roads in Paths.Adjacency]):
+        raise ValueError('The map has no roads, so no car can reach a different cross')
+    MaxStartTime = max(int(np.ceil(CarNum / Rate)), 1)
+    Clock = 0.0
+    with open(CarFile, 'w') as fCar, open(AnswerFile, 'w') as fAnswer:
+        fCar.write('#(id,from,to,speed,planTime)\n')
+        fAnswer.write('#(carID, StartTime, RoadID...)\n')
+        for ChunkStart in range(0, CarNum, ChunkSize):
+            Num = min(ChunkSize, CarNum - ChunkStart)
+            Speed = Rng.integers(SpeedRange[0], SpeedRange[1] + 1, Num).tolist()
+            if Departure == 'uniform':
+                StartTime = Rng.integers(1, MaxStartTime + 1, Num).tolist()
+            elif Departure == 'poisson':
+                Times = Clock + np.cumsum(Rng.exponential(1.0 / Rate, Num))
+                Clock = float(Times[-1])
+                StartTime = (np.floor(Times).astype(np.int64) + 1).tolist()
+            else:
+                raise ValueError('Unknown departure distribution: ' + str(Departure))
+            # 按起点排序后求路径, 使同一起点的最短路径树在一批中只计算一次
+            From = Rng.integers(0, Paths.CrossNum, Num)
+            To = Rng.integers(0, Paths.CrossNum, Num)
+            Routes = [None] * Num
+            for CarIdx in np.argsort(From, kind='stable').tolist():
+                Routes[CarIdx] = Paths.GetPath(int(From[CarIdx]), int(To[CarIdx]))
+                # 单向道路可能使部分路口对不可达, 甚至某些起点无法到达任何路口, 此时重新抽取起点与终点
+                Attempt = 0
+                while Routes[CarIdx] is None:
+                    Attempt += 1
+                    if Attempt > MaxResample:
+                        raise ValueError('No reachable origin/destination pair found after %d draws, '
+                                         'the one-way roads leave almost no cross reachable' % MaxResample)
+                    From[CarIdx], To[CarIdx] = Rng.integers(0, Paths.CrossNum, 2)
+                    Routes[CarIdx] = Paths.GetPath(int(From[CarIdx]), int(To[CarIdx]))
+            CarLines, AnswerLines = [], []
+            for CarIdx in range(Num):
+                CarId = CarIdBase + ChunkStart + CarIdx
+                CarLines.append('(%d, %d, %d, %d, %d)\n' % (CarId, CrossIdBase + From[CarIdx], CrossIdBase + To[CarIdx],
+                                                           Speed[CarIdx], StartTime[CarIdx]))
+                AnswerLines.append('(%d, %d, %s)\n' % (CarId, StartTime[CarIdx], ', '.join(map(str, Routes[CarIdx]))))
+            fCar.writelines(CarLines)
+            fAnswer.writelines(AnswerLines)
+
+# 生成一个完整的地图目录, 包含road.txt, cross.txt, car.txt与answer.txt
+def GenerateConfig(FileDir, Rows, Cols, CarNum, Seed=0, Topology='grid', RemoveRatio=0.3, DuplexRatio=1.0,
+                   LengthRange=(10, 20), RoadSpeedRange=(4, 8), ChannelRange=(1, 3), CarSpeedRange=(2, 8),
+                   Departure='uniform', Rate=None):
+    '''
+    Rate: 平均每个时间片出发的车辆数, 默认为路口数的1/30
+    其余参数见GenerateRoads与WriteCars
+    '''
+    Rng = np.random.default_rng(Seed)
+    Roads, Crosses = GenerateRoads(Rows, Cols, Rng, Topology, RemoveRatio, DuplexRatio, LengthRange,
+                                   RoadSpeedRange, ChannelRange)
+    if not os.path.isdir(FileDir):
+        os.makedirs(FileDir)
+    with open(FileDir + '/road.txt', 'w') as f:
+        f.write('#(id,length,speed,channel,from,to,isDuplex)\n')
+        f.writelines(['(%d, %d, %d, %d, %d, %d, %d)\n' % Road for Road in Roads])
+    with open(FileDir + '/cross.txt', 'w') as f:
+        f.write('#(id,roadId,roadId,roadId,roadId)\n')
+        f.writelines(['(%d, %d, %d, %d, %d)\n' % Cross for Cross in Crosses])
+    if Rate is None:
+        Rate = max(len(Crosses) / 30.0, 0.1)
+    Paths = ShortestPathClass(GetAdjacency(Roads, len(Crosses)))
+    WriteCars(FileDir + '/car.txt', FileDir + '/answer.txt', Paths, CarNum, Rng, CarSpeedRange, Departure, Rate)
+
+
+if __name__ == '__main__':
+
+    # 例: python MapGenerator.py big_grid --rows 40 --cols 40 --cars 200000
+    Parser = argparse.ArgumentParser(description='Generate a synthetic map with shortest-path answers')
+    Parser.add_argument('FileDir', help='output directory')
+    Parser.add_argument('--rows', type=int, default=8)
+    Parser.add_argument('--cols', type=int, default=8)
+    Parser.add_argument('--cars', type=int, default=10000)
+    Parser.add_argument('--seed', type=int, default=0)
+    Parser.add_argument('--topology', default='grid', choices=['grid', 'random'])
+    Parser.add_argument('--remove-ratio', type=float, default=0.3, help='random topology: share of non-tree edges dropped')
+    Parser.add_argument('--duplex-ratio', type=float, default=1.0, help='share of two-way roads')
+    Parser.add_argument('--length', default='10-20', help='road length range')
+    Parser.add_argument('--road-speed', default='4-8', help='road speed limit range')
+    Parser.add_argument('--channels', default='1-3', help='channels per direction range')
+    Parser.add_argument('--car-speed', default='2-8', help='car speed range')
+    Parser.add_argument('--departure', default='uniform', choices=['uniform', 'poisson'])
+    Parser.add_argument('--rate', type=float, default=None, help='average departures per tick, default crosses / 30')
+    Args = Parser.parse_args()
+
+    try:
+        GenerateConfig(Args.FileDir, Args.rows, Args.cols, Args.cars, Args.seed, Args.topology, Args.remove_ratio,
+                       Args.duplex_ratio, ParseRange(Args.length), ParseRange(Args.road_speed),
+                       ParseRange(Args.channels), ParseRange(Args.car_speed), Args.departure, Args.rate)
+    except ValueError as e:
+        Parser.error(str(e))
@@ -0,0 +1,500 @@
+# coding=utf-8
+import argparse
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from Loader import LoadAnswer
+from Simulation import DeadLockError, DepartureQueueClass, LoadMap, FromMapToObj, RunSimulation, RaiseCycleDeadLock
+
+# 随车辆所在道路一起在区域之间同步的车辆状态
+CarStateFields = ['IfWait', 'Position', 'RoutePosition', 'NextRoad', 'NextEntranceSlot', 'NextTurn']
+
+# 路口的无向邻接表, 两个路口之间有任一方向的道路即相邻
+def GetCrossNeighbors(Map):
+    Adjacent = (Map.CrossAdjacency != -1) | (Map.CrossAdjacency != -1).T
+    return [np.flatnonzero(Row).tolist() for Row in Adjacent]
+
+# 从Source出发在邻接表上做广度优先搜索, 返回到每个路口的跳数, 不可达为-1
+def BreadthFirstDistance(Neighbors, Source):
+    Distance = [-1] * len(Neighbors)
+    Distance[Source] = 0
+    Queue = deque([Source])
+    while(len(Queue)):
+        Cross = Queue.popleft()
+        for Next in Neighbors[Cross]:
+            if Distance[Next] < 0:
+                Distance[Next] = Distance[Cross] + 1
+                Queue.append(Next)
+    return Distance
+
+# 每个路口的调度负载估计: Answer中经过该路口的道路次数, 每条道路计入两端路口, 另加1
+def GetCrossLoad(Map, AnswerFlat, AnswerOffsets):
+    IsRoad = np.ones(len(AnswerFlat), np.bool_)
+    IsRoad[AnswerOffsets[:-1]] = False
+    IsRoad[AnswerOffsets[:-1] + 1] = False
+    RoadIds = np.array([Road[0] for Road in Map.RoadList], np.int64)
+    Order = RoadIds.argsort()
+    RoadIdx = Order[np.searchsorted(RoadIds, AnswerFlat[IsRoad], sorter=Order)]
+    Ends = np.array([(Map.CrossToIdx[Road[4]], Map.CrossToIdx[Road[5]]) for Road in Map.RoadList], np.int64)
+    return np.bincount(Ends[RoadIdx].ravel(), minlength=len(Map.CrossList)) + 1
+
+# 将路口网络划分为RegionNum个连通性较好的区域, 返回每个路口所属区域的index
+def PartitionCrosses(Map, RegionNum, Load=None):
+    '''
+    Load: 每个路口的负载, 各区域的负载之和尽量相等; 为None时各区域的路口数尽量相等
+    路口调度按路口index顺序进行, 相邻路口之间存在先后依赖, 因此区域应沿index增长的方向延伸,
+    使每个区域在每一轮调度中都有可以并行调度的路口:
+    每个连通分量取index最小的路口S0, 以及index最小的一批路口中离S0最远的路口S1,
+    按两者的广度优先距离之差排序后等分为条带, 网格地图上即为与行方向垂直的列条带
+    '''
+    Neighbors = GetCrossNeighbors(Map)
+    CrossNum = len(Neighbors)
+    Key = np.zeros(CrossNum)
+    Assigned = np.zeros(CrossNum, np.bool_)
+    for Source in range(CrossNum):
+        if Assigned[Source]:
+            continue
+        Distance0 = np.array(BreadthFirstDistance(Neighbors, Source))
+        Component = np.flatnonzero(Distance0 >= 0)
+        Assigned[Component] = True
+        Lowest = Component[:int(math.ceil(math.sqrt(len(Component))))]
+        Farthest = int(Lowest[Distance0[Lowest].argmax()])
+        Distance1 = np.array(BreadthFirstDistance(Neighbors, Farthest))
+        Order = np.lexsort((Component, Distance0[Component] - Distance1[Component]))
+        # 每个连通分量内按排名归一化到[0, 1), 各分量分别等分
+        Key[Component[Order]] = np.arange(len(Component)) / float(len(Component))
+    Order = np.lexsort((np.arange(CrossNum), Key))
+    Load = np.ones(CrossNum) if Load is None else np.asarray(Load, np.float64)
+    Cumulative = np.cumsum(Load[Order]) - Load[Order]
+    Region = np.zeros(CrossNum, np.int64)
+    Region[Order] = np.minimum((Cumulative * RegionNum / max(Load.sum(), 1e-9)).astype(np.int64), RegionNum - 1)
+    return Region
+
+# 两端路口属于不同区域的道路数
+def CountBoundaryRoads(Map, Region):
+    return sum([Region[RoadDir[2]] != Region[RoadDir[3]] for RoadDir in Map.RoadDirList])
+
+# 工作进程中的一个区域: 保存完整的调度状态副本, 但只推进本区域的道路与路口
+class RegionWorkerClass(object):
+    def __init__(self, Map, AnswerFlat, AnswerOffsets, Region, RegionIdx):
+        '''
+        Region: 每个路口所属区域的index
+        道路属于其终点路口所在的区域, 由该区域完成道路内行驶; 起点路口在其它区域的道路为边界道路,
+        两侧区域轮流修改边界道路(终点一侧驶离, 起点一侧驶入), 每次修改后将整条道路连同道路上车辆的状态发给另一侧
+        '''
+        self.RoadObjList, self.CrossObjList, CarObjToStart, _, self.ActiveSet, self.CarArray = \
+            FromMapToObj(Map, AnswerFlat, AnswerOffsets, 'array')
+        self.Region = Region
+        self.RegionIdx = RegionIdx
+        # 只保留从本区域路口出发的车辆, 同一时刻出发的车辆保持原来的顺序
+        Cars = [Car for _, Batch in CarObjToStart.Batches for Car in Batch]
+        Cars = [Car for Car in Cars if Region[self.CarArray.StartCross[Car]] == RegionIdx]
+        self.CarObjToStart = DepartureQueueClass(Cars, self.CarArray.StartTime[Cars])
+
+        RoadFrom = np.array([RoadDir[2] for RoadDir in Map.RoadDirList], np.int64)
+        RoadTo = np.array([RoadDir[3] for RoadDir in Map.RoadDirList], np.int64)
+        self.OwnRoad = Region[RoadTo] == RegionIdx
+        # 本区域每个路口相邻的边界道路, 元素为(道路index, 另一侧区域); OutBoundary只包含从该路口驶出的道路
+        self.Boundary = dict([(CrossIdx, []) for CrossIdx in np.flatnonzero(Region == RegionIdx).tolist()])
+        self.OutBoundary = dict([(CrossIdx, []) for CrossIdx in self.Boundary])
+        for RoadIdx in np.flatnonzero(Region[RoadFrom] != Region[RoadTo]).tolist():
+            From, To = int(RoadFrom[RoadIdx]), int(RoadTo[RoadIdx])
+            if From in self.Boundary:
+                self.Boundary[From].append((RoadIdx, int(Region[To])))
+                self.OutBoundary[From].append((RoadIdx, int(Region[To])))
+            if To in self.Boundary:
+                self.Boundary[To].append((RoadIdx, int(Region[From])))
+        # 本区域每个路口的相邻路口中index较小的路口, 同一轮中它们调度完成后才能调度该路口
+        Neighbors = GetCrossNeighbors(Map)
+        self.LowerNeighbors = dict([(CrossIdx, [Cross for Cross in Neighbors[CrossIdx] if Cross < CrossIdx]) \
+                                    for CrossIdx in self.Boundary])
+        # 边界道路上次发送或接收时的等待图版本号, 路口调度阶段对道路的每次修改都会使版本号加1
+        self.SyncVersion = [-1] * len(self.RoadObjList)
+        self.InRound = set()
+        self.Done = set()
+        self.Todo = []
+
+    # 打包道路及道路上车辆的状态, 返回{目标区域: 数据包}
+    def PackRoads(self, RoadsAndRegions):
+        Packets = {}
+        Version = self.ActiveSet.WaitForGraph.Version
+        for RoadIdx, Dest in RoadsAndRegions:
+            RoadObj = self.RoadObjList[RoadIdx]
+            Packets.setdefault(Dest, []).append((RoadIdx, [list(Channel) for Channel in RoadObj.Cars], RoadObj.CarNum,
+                                                 list(RoadObj.WaitChannels), RoadObj.WaitFirstPriority))
+            self.SyncVersion[RoadIdx] = Version[RoadIdx]
+        for Dest, RoadStates in Packets.items():
+            Cars = np.array([Car for RoadState in RoadStates for Channel in RoadState[1] for Car in Channel], np.int64)
+            Packets[Dest] = (RoadStates, Cars, [getattr(self.CarArray, Field)[Cars] for Field in CarStateFields])
+        return Packets
+
+    # 用其它区域发来的数据包覆盖本地副本中的道路与车辆状态
+    def UnpackRoads(self, Packets):
+        WaitForGraph = self.ActiveSet.WaitForGraph
+        for RoadStates, Cars, CarStates in Packets:
+            for RoadIdx, Channels, CarNum, WaitChannels, WaitFirstPriority in RoadStates:
+                RoadObj = self.RoadObjList[RoadIdx]
+                for Channel, ChannelCars in zip(RoadObj.Cars, Channels):
+                    Channel.clear()
+                    Channel.extend(ChannelCars)
+                RoadObj.CarNum = CarNum
+                RoadObj.WaitChannels = set(WaitChannels)
+                RoadObj.WaitFirstPriority = WaitFirstPriority
+                if CarNum:
+                    self.ActiveSet.Roads.add(RoadIdx)
+                else:
+                    self.ActiveSet.Roads.discard(RoadIdx)
+                WaitForGraph.Update(RoadIdx)
+                self.SyncVersion[RoadIdx] = WaitForGraph.Version[RoadIdx]
+            for Field, Values in zip(CarStateFields, CarStates):
+                getattr(self.CarArray, Field)[Cars] = Values
+
+    # 道路内行驶阶段, 返回本区域需要调度的路口与发给其它区域的边界道路
+    def RoadPhase(self, Packets):
+        self.UnpackRoads(Packets)
+        Roads = [RoadIdx for RoadIdx in self.ActiveSet.Roads if self.OwnRoad[RoadIdx]]
+        self.CarArray.UpdateTerminalStateRoads(self.RoadObjList, Roads)
+        Crosses = sorted(self.ActiveSet.Crosses)
+        self.ActiveSet.Crosses.clear()
+        self.ActiveSet.WaitForGraph.Clear()
+        RoadFrom = [self.RoadObjList[RoadIdx].FromCross for RoadIdx in Roads]
+        return Crosses, self.PackRoads([(RoadIdx, int(self.Region[From])) for RoadIdx, From in zip(Roads, RoadFrom) \
+                                        if self.Region[From] != self.RegionIdx])
+
+    # 路口调度阶段的一步: 调度本轮中index小于Bound且相邻的较小路口都已完成调度的本区域路口
+    def CrossStep(self, Bound, RoundList, NewlyDone, Packets):
+        '''
+        RoundList: 新一轮开始时为本轮全部需要调度的路口, 否则为None
+        NewlyDone: 其它区域在上一步中完成调度的路口
+        返回值: (完成调度的路口, 其中仍有车辆被阻塞的路口, 本区域的LockCheckSymbol, 到达车辆,
+                 等待图中发现的环(死锁路口编号, 环)或None, 发给其它区域的边界道路)
+        到达车辆为列表, 元素为(路口index, 该路口按到达顺序的车辆index)
+        '''
+        if RoundList is not None:
+            self.InRound = set(RoundList)
+            self.Done = set()
+            self.Todo = [CrossIdx for CrossIdx in RoundList if self.Region[CrossIdx] == self.RegionIdx]
+        self.UnpackRoads(Packets)
+        self.Done.update(NewlyDone)
+        Done, InRound, WaitForGraph = self.Done, self.InRound, self.ActiveSet.WaitForGraph
+        Processed, StillWait, Arrivals, Remaining = [], [], [], []
+        LockCheckSymbol, DeadLock = True, None
+        for Position, CrossIdx in enumerate(self.Todo):
+            if CrossIdx >= Bound or DeadLock is not None:
+                Remaining.extend(self.Todo[Position:])
+                break
+            if not all([Cross in Done or Cross not in InRound for Cross in self.LowerNeighbors[CrossIdx]]):
+                Remaining.append(CrossIdx)
+                continue
+            CrossObj = self.CrossObjList[CrossIdx]
+            CarHasEnd = []
+            LockCheckSymbol = CrossObj.ScheduleRoads(self.RoadObjList, CarHasEnd, LockCheckSymbol) and LockCheckSymbol
+            Done.add(CrossIdx)
+            Processed.append(CrossIdx)
+            if CrossObj.WaitSchedule:
+                StillWait.append(CrossIdx)
+            if len(CarHasEnd):
+                Arrivals.append((CrossIdx, CarHasEnd))
+            # 环上的道路两端都在本区域内, 这样的环与串行调度中的环相同
+            if WaitForGraph.Cycle is not None:
+                try:
+                    RaiseCycleDeadLock(self.RoadObjList, self.CrossObjList, WaitForGraph.Cycle)
+                except DeadLockError as e:
+                    DeadLock = (e.LockedCrosses, e.Cycle)
+        self.Todo = Remaining
+        Version = WaitForGraph.Version
+        Changed = [(RoadIdx, Dest) for CrossIdx in Processed for RoadIdx, Dest in self.Boundary[CrossIdx] \
+                   if Version[RoadIdx] != self.SyncVersion[RoadIdx]]
+        return Processed, StillWait, LockCheckSymbol, Arrivals, DeadLock, self.PackRoads(Changed)
+
+    # 车库上路阶段, 返回有车辆驶入的边界道路
+    def GaragePhase(self, NowTime, Packets):
+        self.UnpackRoads(Packets)
+        self.CarArray.AddCarToGarage(NowTime, self.CrossObjList, self.CarObjToStart)
+        Changed = []
+        for CrossIdx in list(self.ActiveSet.GarageCrosses):
+            CrossObj = self.CrossObjList[CrossIdx]
+            GarageCarNum = CrossObj.GarageCarNum
+            CrossObj.AddCarFromGarage(self.RoadObjList)
+            if CrossObj.GarageCarNum != GarageCarNum:
+                Changed.extend(self.OutBoundary[CrossIdx])
+        return self.PackRoads(Changed)
+
+    # 本区域道路上的车辆, 元素为(道路index, 各车道的车辆index列表, 车辆位置列表), 用于与串行调度比对
+    def GatherRoads(self, Packets):
+        self.UnpackRoads(Packets)
+        Position = self.CarArray.Position
+        return [(RoadIdx, [list(Channel) for Channel in RoadObj.Cars],
+                 [Position[list(Channel)].tolist() for Channel in RoadObj.Cars]) \
+                for RoadIdx, RoadObj in enumerate(self.RoadObjList) if self.OwnRoad[RoadIdx]]
+
+# 工作进程的主循环: 依次执行主进程发来的命令(方法名, 参数), 返回(执行占用的CPU时间, 结果); 异常以文本返回给主进程
+def RegionWorkerMain(Conn, Map, AnswerFlat, AnswerOffsets, Region, RegionIdx):
+    import traceback
+    try:
+        Worker = RegionWorkerClass(Map, AnswerFlat, AnswerOffsets, Region, RegionIdx)
+        Conn.send((0.0, None))
+        while(True):
+            Command = Conn.recv()
+            if Command is None:
+                break
+            t0 = time.process_time()
+            Result = getattr(Worker, Command[0])(*Command[1:])
+            Conn.send((time.process_time() - t0, Result))
+    except Exception:
+        Conn.send(('Error', traceback.format_exc()))
+    finally:
+        Conn.close()
+
+# 分区并行调度: 每个区域的道路内行驶与路口调度在一个工作进程中进行, 主进程协调每个时间片的各个阶段
+class PartitionedSimulationClass(object):
+    def __init__(self, Map, AnswerFlat, AnswerOffsets, Workers=None, Region=None, Pipeline=4):
+        '''
+        Workers: 工作进程数即区域数, 默认为CPU核数
+        Region: 每个路口所属区域的index, 默认由PartitionCrosses按GetCrossLoad的负载划分; 任意划分的结果都与串行调度相同
+        Pipeline: 每轮路口调度按路口index分为约Pipeline * Workers个窗口逐步推进,
+                  使依赖其它区域的路口可以在下一步中与其它区域并行调度
+        调度结果与数组模式的串行调度完全相同: 相邻路口按index顺序调度, 不相邻的路口不访问同一条道路, 调度顺序可以交换;
+        每轮中到达的车辆按路口index排序, 与串行调度的到达顺序相同. 死锁的时间片相同, 但由等待图判定时,
+        跨区域的环要到该轮调度结束才由LockCheckSymbol判定, 死锁信息中的路口与环可能不同
+        '''
+        self.Map = Map
+        self.Workers = Workers or os.cpu_count() or 1
+        if Region is None:
+            Region = PartitionCrosses(Map, self.Workers, GetCrossLoad(Map, AnswerFlat, AnswerOffsets))
+        self.Region = np.asarray(Region, np.int64)
+        self.Workers = int(self.Region.max()) + 1 if len(self.Region) else 1
+        self.Windows = 1 if self.Workers == 1 else Pipeline * self.Workers
+        StartTime = AnswerFlat[AnswerOffsets[:-1] + 1]
+        SortedStartCarIdx = StartTime.argsort()
+        self.CarObjToStart = DepartureQueueClass(SortedStartCarIdx.tolist(), StartTime[SortedStartCarIdx])
+        self.CarObjHasEnd = []
+        self.CarNum = len(StartTime)
+        self.NowTime = 0
+        # 各区域执行命令的CPU时间之和, 每一步中最慢区域的CPU时间之和, 以及主进程在Run中的CPU时间;
+        # 后两者之和近似为每个区域独占一个CPU核时的调度耗时, 与串行调度的CPU时间之比即为划分允许的加速比上限
+        self.WorkTime = 0.0
+        self.CriticalTime = 0.0
+        self.MasterTime = 0.0
+        self.Steps = 0
+        # 发往各区域, 尚未送达的边界道路数据包
+        self.Inbox = [[] for _ in range(self.Workers)]
+        StartMethod = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        Context = multiprocessing.get_context(StartMethod)
+        self.Conns, self.Processes = [], []
+        for RegionIdx in range(self.Workers):
+            Conn, WorkerConn = Context.Pipe()
+            Process = Context.Process(target=RegionWorkerMain, args=(WorkerConn, Map, AnswerFlat, AnswerOffsets,
+                                                                       self.Region, RegionIdx), daemon=True)
+            Process.start()
+            WorkerConn.close()
+            self.Conns.append(Conn)
+            self.Processes.append(Process)
+        self.Receive()
+        self.WorkTime, self.CriticalTime, self.Steps = 0.0, 0.0, 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *Args):
+        self.Close()
+
+    def Close(self):
+        for Conn, Process in zip(self.Conns, self.Processes):
+            try:
+                Conn.send(None)
+            except (OSError, EOFError):
+                pass
+            Conn.close()
+            Process.join()
+        self.Conns, self.Processes = [], []
+
+    # 向所有区域发送同一命令, 每个区域附带发给它的边界道路
+    def Send(self, Name, *Args):
+        for RegionIdx, Conn in enumerate(self.Conns):
+            Conn.send((Name, ) + Args + (self.Inbox[RegionIdx], ))
+            self.Inbox[RegionIdx] = []
+
+    # 接收所有区域的结果, 结果的最后一项为发给其它区域的边界道路时转存到Inbox;
+    # 有区域出错时先收齐其余区域本步的回复再抛出RuntimeError, 使连接上不残留未读的结果
+    def Receive(self, HasPackets=False):
+        Results, Elapsed, Errors = [], [], []
+        for RegionIdx, Conn in enumerate(self.Conns):
+            try:
+                Time, Result = Conn.recv()
+            except EOFError:
+                Time, Result = 'Error', 'Region %d exited without replying\n' % RegionIdx
+            if Time == 'Error':
+                Errors.append(Result)
+                continue
+            Elapsed.append(Time)
+            if HasPackets:
+                Packets = Result[-1] if isinstance(Result, tuple) else Result
+                for Dest, Packet in Packets.items():
+                    self.Inbox[Dest].append(Packet)
+            Results.append(Result)
+        if len(Errors):
+            raise RuntimeError('Region worker failed:\n' + '\n'.join(Errors))
+        self.WorkTime += sum(Elapsed)
+        self.CriticalTime += max(Elapsed)
+        self.Steps += 1
+        return Results
+
+    # 与Simulation.ScheduleAllCrosses相同的多轮路口调度, 每轮由各区域分步并行完成
+    def ScheduleAllCrosses(self, NeedScheduleCross):
+        FirstRound = len(NeedScheduleCross) < len(self.Map.CrossList)
+        while(len(NeedScheduleCross)):
+            LockCheckSymbol = not FirstRound
+            FirstRound = False
+            Step = max(1, int(math.ceil(len(NeedScheduleCross) / float(self.Windows))))
+            RoundList, NewlyDone, DoneNum, StepIdx = NeedScheduleCross, [], 0, 0
+            StillWait, Arrivals = [], []
+            while(DoneNum < len(NeedScheduleCross)):
+                StepIdx += 1
+                Bound = NeedScheduleCross[min(StepIdx * Step, len(NeedScheduleCross)) - 1] + 1
+                self.Send('CrossStep', Bound, RoundList, NewlyDone)
+                RoundList, NewlyDone = None, []
+                for Processed, Wait, RegionLock, RegionArrivals, DeadLock, _ in self.Receive(True):
+                    if DeadLock is not None:
+                        raise DeadLockError(*DeadLock)
+                    NewlyDone.extend(Processed)
+                    StillWait.extend(Wait)
+                    Arrivals.extend(RegionArrivals)
+                    LockCheckSymbol = LockCheckSymbol and RegionLock
+                DoneNum += len(NewlyDone)
+            Arrivals.sort(key=lambda Arrival: Arrival[0])
+            for _, Cars in Arrivals:
+                self.CarObjHasEnd.extend(Cars)
+            NeedScheduleCross = sorted(StillWait)
+
+            if LockCheckSymbol:
+                raise DeadLockError([self.Map.CrossList[CrossIdx][0] for CrossIdx in NeedScheduleCross])
+
+    # 执行一个时间片的调度: 道路内行驶 -> 路口调度 -> 车库上路
+    def UpdateOneTick(self, NowTime):
+        self.Send('RoadPhase')
+        NeedScheduleCross = sorted([CrossIdx for Crosses, _ in self.Receive(True) for CrossIdx in Crosses])
+        self.ScheduleAllCrosses(NeedScheduleCross)
+        self.CarObjToStart.PopBatch(NowTime)
+        self.Send('GaragePhase', NowTime)
+        self.Receive(True)
+
+    # 与Simulation.RunSimulation相同, 运行到所有车辆到达终点或StopTime, 返回当前时间片
+    def Run(self, EventDriven=True, ArriveTimes=None, StopTime=None, ProgressInterval=None):
+        '''
+        死锁时抛出DeadLockError并设置NowTime, 之后不能继续调度; 死锁的时间片中到达的车辆可能与串行调度不同,
+        与RunSimulation一样, ArriveTimes只记录死锁之前完整的时间片
+        '''
+        # 主进程协调各区域(收发与合并结果)的CPU时间计入MasterTime
+        tMaster = time.process_time()
+        try:
+            return self.RunTicks(EventDriven, ArriveTimes, StopTime, ProgressInterval)
+        finally:
+            self.MasterTime += time.process_time() - tMaster
+
+    def RunTicks(self, EventDriven, ArriveTimes, StopTime, ProgressInterval):
+        NowTime, EndNum = self.NowTime, len(self.CarObjHasEnd)
+        tReport, TickReport = time.time(), NowTime
+        while(len(self.CarObjHasEnd) < self.CarNum):
+            if StopTime is not None and NowTime >= StopTime:
+                break
+            if EventDriven and len(self.CarObjToStart) + len(self.CarObjHasEnd) == self.CarNum:
+                NowTime = max(NowTime, self.CarObjToStart.NextStartTime())
+                if StopTime is not None and NowTime >= StopTime:
+                    NowTime = StopTime
+                    break
+            try:
+                self.UpdateOneTick(NowTime)
+            except DeadLockError as e:
+                e.NowTime = self.NowTime = NowTime
+                raise
+            NowTime += 1
+            if ArriveTimes is not None:
+                ArriveTimes.extend([NowTime] * (len(self.CarObjHasEnd) - EndNum))
+                EndNum = len(self.CarObjHasEnd)
+            if ProgressInterval is not None and time.time() - tReport >= ProgressInterval:
+                tNow = time.time()
+                print('NowTime: %d, Arrived: %d/%d, %.0f ticks/s' % (NowTime, len(self.CarObjHasEnd), self.CarNum,
+                                                                     (NowTime - TickReport) / max(tNow - tReport, 1e-9)))
+                tReport, TickReport = tNow, NowTime
+        self.NowTime = NowTime
+        return NowTime
+
+    # 全部道路上的车辆, 列表下标为道路index, 元素为(各车道的车辆index列表, 车辆位置列表)
+    def GatherRoads(self):
+        self.Send('GatherRoads')
+        Roads = [None] * len(self.Map.RoadDirList)
+        for RoadStates in self.Receive():
+            for RoadIdx, Channels, Positions in RoadStates:
+                Roads[RoadIdx] = (Channels, Positions)
+        return Roads
+
+# 运行一份Answer, 返回字典: ScheduleTime(死锁时为死锁的时间片), DeadLock, CarHasEnd与ArriveTimes(死锁之前完整的时间片中
+# 到达的车辆及其到达时间), RunTime(调度耗时, 不含构建调度对象); 串行调度另有CPUTime(调度的CPU时间);
+# 分区调度另有Boundary(边界道路数), Steps(主进程与各区域的同步次数)与CriticalTime(每一步最慢区域的CPU时间之和
+# 加上主进程的CPU时间, 见PartitionedSimulationClass), 与CPUTime使用同一种时钟
+def RunSerial(Map, AnswerFlat, AnswerOffsets):
+    State = FromMapToObj(Map, AnswerFlat, AnswerOffsets, 'array')
+    ArriveTimes = []
+    t0, tCPU = time.time(), time.process_time()
+    try:
+        ScheduleTime, DeadLock = RunSimulation(*State, ArriveTimes=ArriveTimes), False
+    except DeadLockError as e:
+        ScheduleTime, DeadLock = e.NowTime, True
+    return {'ScheduleTime': ScheduleTime, 'DeadLock': DeadLock, 'CarHasEnd': State[3][:len(ArriveTimes)],
+            'ArriveTimes': ArriveTimes, 'RunTime': time.time() - t0, 'CPUTime': time.process_time() - tCPU}
+
+def RunPartitioned(Map, AnswerFlat, AnswerOffsets, Workers, Pipeline=4):
+    with PartitionedSimulationClass(Map, AnswerFlat, AnswerOffsets, Workers, Pipeline=Pipeline) as Simulation:
+        ArriveTimes = []
+        t0 = time.time()
+        try:
+            ScheduleTime, DeadLock = Simulation.Run(ArriveTimes=ArriveTimes), False
+        except DeadLockError as e:
+            ScheduleTime, DeadLock = e.NowTime, True
+        return {'ScheduleTime': ScheduleTime, 'DeadLock': DeadLock,
+                'CarHasEnd': Simulation.CarObjHasEnd[:len(ArriveTimes)], 'ArriveTimes': ArriveTimes,
+                'RunTime': time.time() - t0, 'Boundary': CountBoundaryRoads(Map, Simulation.Region),
+                'Steps': Simulation.Steps, 'CriticalTime': Simulation.CriticalTime + Simulation.MasterTime}
+
+def FormatResult(Name, Result, Serial):
+    ScheduleTime = '%d%s' % (Result['ScheduleTime'], ' (DeadLock)' if Result['DeadLock'] else '')
+    if Result is Serial:
+        return '%-8s %8s %8s %14s %8.2fs %8s %9s %9s %6s' % (Name, '-', '-', ScheduleTime, Result['RunTime'], '1.00',
+                                                            '-', '-', '-')
+    Equal = all([Result[Key] == Serial[Key] for Key in ['ScheduleTime', 'DeadLock', 'CarHasEnd', 'ArriveTimes']])
+    return '%-8s %8d %8d %14s %8.2fs %8.2f %8.2fs %9.2f %6s' % (
+        Name, Result['Boundary'], Result['Steps'], ScheduleTime, Result['RunTime'],
+        Serial['RunTime'] / max(Result['RunTime'], 1e-9), Result['CriticalTime'],
+        Serial['CPUTime'] / max(Result['CriticalTime'], 1e-9), 'Yes' if Equal else 'No')
+
+
+if __name__ == '__main__':
+
+    # 例: python Partition.py config_5 --workers 1 2 4
+    Parser = argparse.ArgumentParser(description='Compare the partitioned multi-process simulation with the serial '
+                                                 'array engine on one map')
+    Parser.add_argument('FileDir', help='directory containing road.txt, cross.txt and car.txt')
+    Parser.add_argument('--answer', default=None, help='answer file, default FileDir/answer.txt')
+    Parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='worker counts to run')
+    Parser.add_argument('--pipeline', type=int, default=4, help='scheduling windows per worker in each round')
+    Args = Parser.parse_args()
+
+    Map = LoadMap(Args.FileDir + '/road.txt', Args.FileDir + '/cross.txt', Args.FileDir + '/car.txt')
+    AnswerFlat, AnswerOffsets = LoadAnswer(Args.answer or Args.FileDir + '/answer.txt')
+    print('CPU count: %d, crosses: %d, roads: %d, cars: %d' % (os.cpu_count() or 1, len(Map.CrossList),
+                                                              len(Map.RoadDirList), len(Map.CarTable)))
+    # Speedup为实际耗时之比; Critical为每一步中最慢区域的CPU时间之和加上主进程的CPU时间, Bound为串行调度的CPU时间
+    # 与其之比, 即CPU核数不少于区域数时的加速比上限; 两者都用CPU时间, 不受其它进程抢占CPU的影响
+    print('%-8s %8s %8s %14s %9s %8s %9s %9s %6s' % ('Workers', 'Boundary', 'Steps', 'ScheduleTime', 'RunTime',
+                                                     'Speedup', 'Critical', 'Bound', 'Equal'))
+    Serial = RunSerial(Map, AnswerFlat, AnswerOffsets)
+    print(FormatResult('serial', Serial, Serial))
+    for Workers in Args.workers:
+        print(FormatResult(str(Workers), RunPartitioned(Map, AnswerFlat, AnswerOffsets, Workers, Args.pipeline),
+                           Serial))
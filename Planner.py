@@ -0,0 +1,162 @@
+# coding=utf-8
+import argparse
+import heapq
+import time
+
+import numpy as np
+
+from MapGenerator import ShortestPathClass
+from Simulation import LoadMap
+
+# 路线规划: 按时间权重(道路长度 / min(道路限速, 车速))求最短路径, 并按路网负载目标分配出发时间
+# 最短路径以起点为单位用MapGenerator.ShortestPathClass的Dijkstra计算, 到该起点的全部终点的距离确定后即停止
+
+# 有向道路图的边表, 由路口邻接矩阵得到
+class RouteGraphClass(object):
+    def __init__(self, Map):
+        '''
+        Map: MapClass
+        '''
+        self.CrossNum = len(Map.CrossList)
+        FromIdx, ToIdx = np.nonzero(Map.CrossAdjacency >= 0)
+        self.EdgeFrom, self.EdgeTo, self.EdgeRoad = FromIdx, ToIdx, Map.CrossAdjacency[FromIdx, ToIdx]
+
+        Roads = [Map.RoadDirList[Road][0] for Road in self.EdgeRoad.tolist()]
+        self.EdgeRoadNum = np.array([Road[0] for Road in Roads], np.int64)
+        self.EdgeLength = np.array([Road[1] for Road in Roads], np.float64)
+        self.EdgeSpeed = np.array([Road[2] for Road in Roads], np.int64)
+        self.MinRoadSpeed = int(self.EdgeSpeed.min()) if len(Roads) else 1
+        self.MaxRoadSpeed = int(self.EdgeSpeed.max()) if len(Roads) else 1
+
+    # 车速等级为Speed时的邻接表, 格式见MapGenerator.ShortestPathClass, 边的权重为长度 / min(道路限速, Speed)
+    def GetAdjacency(self, Speed):
+        Weight = (self.EdgeLength / np.minimum(self.EdgeSpeed, Speed)).tolist()
+        Adjacency = [[] for _ in range(self.CrossNum)]
+        for From, To, RoadNum, EdgeWeight in zip(self.EdgeFrom.tolist(), self.EdgeTo.tolist(),
+                                                 self.EdgeRoadNum.tolist(), Weight):
+            Adjacency[From].append((To, RoadNum, EdgeWeight))
+        return Adjacency
+
+class PlannerClass(object):
+    def __init__(self, Map):
+        '''
+        Map: MapClass, 使用其中的路口邻接矩阵与车辆表
+        '''
+        self.Map = Map
+        self.Graph = RouteGraphClass(Map)
+        # 已规划的路线, 键为(起点路口index, 终点路口index, 车速等级), 值为(道路编号元组, 预计行驶时间)
+        self.PathCache = {}
+
+    # 车速不低于所有道路限速时行驶时间与车速无关; 车速不高于所有道路限速时各边权重同比例缩放, 最短路径相同.
+    # 这两种车各自共用一个等级
+    def SpeedClass(self, Speed):
+        return np.clip(Speed, self.Graph.MinRoadSpeed, self.Graph.MaxRoadSpeed)
+
+    # 为每辆车规划最短路径, 返回道路编号列表与预计行驶时间
+    def PlanRoutes(self, CarTable=None):
+        '''
+        CarTable: 与car.txt格式相同的车辆表, 默认为地图中的车辆表
+        返回值:
+        Routes: 列表, 第i个元素为第i辆车依次经过的道路编号
+        TravelTimes: 数组, 第i辆车按路线行驶的时间下界
+        '''
+        if CarTable is None:
+            CarTable = self.Map.CarTable
+        CrossToIdx = self.Map.CrossToIdx
+        From = np.array([CrossToIdx[Cross] for Cross in CarTable[:, 1].tolist()], np.int64)
+        To = np.array([CrossToIdx[Cross] for Cross in CarTable[:, 2].tolist()], np.int64)
+        if np.any(From == To):
+            raise ValueError('Car %d starts at its destination' % CarTable[np.argmax(From == To), 0])
+        Speed = CarTable[:, 3]
+        Class = self.SpeedClass(Speed)
+        Keys = list(zip(From.tolist(), To.tolist(), Class.tolist()))
+        self.PlanKeys(set(Keys).difference(self.PathCache))
+        Paths = [self.PathCache[Key] for Key in Keys]
+        # 车速低于等级时行驶时间按比例放大
+        TravelTimes = np.array([Path[1] for Path in Paths], np.float64) * np.maximum(Class / Speed, 1.0)
+        return [list(Path[0]) for Path in Paths], TravelTimes
+
+    # 计算缓存中还没有的路线, 同一起点与车速等级的路线共用一次Dijkstra
+    def PlanKeys(self, Keys):
+        Groups = {}
+        for From, To, Speed in Keys:
+            Groups.setdefault(Speed, {}).setdefault(From, []).append(To)
+        for Speed, Targets in Groups.items():
+            Paths = ShortestPathClass(self.Graph.GetAdjacency(Speed), CacheSize=0)
+            for From in sorted(Targets):
+                for To, (Path, Time) in zip(Targets[From], Paths.GetPaths(From, Targets[From])):
+                    if Path is None:
+                        raise ValueError('No route from cross %d to cross %d' % (
+                            self.Map.CrossList[From][0], self.Map.CrossList[To][0]))
+                    self.PathCache[(From, To, Speed)] = (tuple(Path), Time)
+
+    # 为每辆车分配出发时间, 使路网上预计同时行驶的车辆数不超过负载目标
+    def AssignStartTimes(self, TravelTimes, CarTable=None, MaxCarsOnRoad=None, MaxDepartPerTick=None):
+        '''
+        TravelTimes: PlanRoutes返回的预计行驶时间
+        MaxCarsOnRoad: 路网上同时行驶的车辆数上限, 为None时不限制
+        MaxDepartPerTick: 每个时间片出发的车辆数上限, 为None时不限制
+        按计划出发时间的顺序依次出发, 车辆的出发时间不早于计划出发时间, 也不早于前一辆车的出发时间;
+        达到负载目标时等待预计最早到达的车辆到达后再出发
+        '''
+        if CarTable is None:
+            CarTable = self.Map.CarTable
+        Order = np.lexsort((CarTable[:, 0], CarTable[:, 4])).tolist()
+        PlanTimes = CarTable[:, 4].tolist()
+        Durations = np.ceil(TravelTimes).astype(np.int64).tolist()
+        StartTimes = [0] * len(Order)
+        OnRoad = []
+        NowTime, DepartNum = 0, 0
+        for CarIdx in Order:
+            StartTime = max(PlanTimes[CarIdx], NowTime)
+            while len(OnRoad) and OnRoad[0] <= StartTime:
+                heapq.heappop(OnRoad)
+            if MaxCarsOnRoad is not None and len(OnRoad) >= MaxCarsOnRoad:
+                StartTime = heapq.heappop(OnRoad)
+            if StartTime != NowTime:
+                NowTime, DepartNum = StartTime, 0
+            if MaxDepartPerTick is not None and DepartNum >= MaxDepartPerTick:
+                NowTime, DepartNum = NowTime + 1, 0
+                while len(OnRoad) and OnRoad[0] <= NowTime:
+                    heapq.heappop(OnRoad)
+            StartTimes[CarIdx] = NowTime
+            DepartNum += 1
+            heapq.heappush(OnRoad, NowTime + Durations[CarIdx])
+        return np.array(StartTimes, np.int64)
+
+    # 规划全部车辆, 返回Answer的行列表, 每行为(carID, StartTime, RoadID...)
+    def Plan(self, MaxCarsOnRoad=None, MaxDepartPerTick=None):
+        CarTable = self.Map.CarTable
+        Routes, TravelTimes = self.PlanRoutes(CarTable)
+        StartTimes = self.AssignStartTimes(TravelTimes, CarTable, MaxCarsOnRoad, MaxDepartPerTick)
+        return [[CarId, StartTime] + Route for CarId, StartTime, Route in
+                zip(CarTable[:, 0].tolist(), StartTimes.tolist(), Routes)]
+
+def WriteAnswer(AnswerFile, Rows):
+    with open(AnswerFile, 'w') as f:
+        f.write('#(carID, StartTime, RoadID...)\n')
+        f.writelines(['(%s)\n' % ', '.join(map(str, Row)) for Row in Rows])
+
+
+if __name__ == '__main__':
+
+    # 例: python Planner.py config_5 -o answer.txt --max-cars 2000 --evaluate
+    Parser = argparse.ArgumentParser(description='Plan shortest-time routes and departure times for car.txt')
+    Parser.add_argument('FileDir', help='directory containing road.txt, cross.txt and car.txt')
+    Parser.add_argument('-o', '--output', default='answer.txt', help='answer file to write')
+    Parser.add_argument('--max-cars', type=int, default=None, help='target number of cars on the roads at once')
+    Parser.add_argument('--max-depart', type=int, default=None, help='maximum departures per tick')
+    Parser.add_argument('--evaluate', action='store_true', help='run the simulation on the planned answer')
+    Parser.add_argument('--engine', default='object', choices=['object', 'array'])
+    Args = Parser.parse_args()
+
+    t0 = time.time()
+    Map = LoadMap(Args.FileDir + '/road.txt', Args.FileDir + '/cross.txt', Args.FileDir + '/car.txt')
+    Planner = PlannerClass(Map)
+    Rows = Planner.Plan(Args.max_cars, Args.max_depart)
+    WriteAnswer(Args.output, Rows)
+    print('Planned %d cars (%d distinct routes) in %.2fs, written to %s' % (len(Rows), len(Planner.PathCache),
+                                                                            time.time() - t0, Args.output))
+    if Args.evaluate:
+        from BatchRunner import EvaluatePlan, FormatTable
+        print(FormatTable([EvaluatePlan(Map, Args.output, Rows, Args.engine)]))
@@ -0,0 +1,111 @@
+# coding=utf-8
+import csv
+
+import numpy as np
+
+# 到达车辆记录与每个时间片统计记录的字段
+CarFields = ['CarId', 'ArriveTime', 'TravelTime', 'RouteLength']
+TickFields = ['NowTime', 'OnRoad', 'InGarage', 'Arrived']
+
+# 按文件名选择格式的缓冲写入器: 以.bin结尾时为小端int64的二进制记录, 否则为带表头的CSV
+class RecordWriterClass(object):
+    def __init__(self, FileName, Fields, BufferSize=65536):
+        '''
+        BufferSize: 缓冲的记录数, 达到后一次性写入文件
+        '''
+        self.Binary = FileName.endswith('.bin')
+        self.File = open(FileName, 'wb' if self.Binary else 'w', newline=None if self.Binary else '')
+        self.Writer = None if self.Binary else csv.writer(self.File)
+        if self.Writer is not None:
+            self.Writer.writerow(Fields)
+        self.BufferSize = BufferSize
+        self.Buffer = []
+
+    def Write(self, Records):
+        self.Buffer.extend(Records)
+        if len(self.Buffer) >= self.BufferSize:
+            self.Flush()
+
+    def Flush(self):
+        if len(self.Buffer):
+            if self.Binary:
+                np.array(self.Buffer, '<i8').tofile(self.File)
+            else:
+                self.Writer.writerows(self.Buffer)
+            self.Buffer = []
+        self.File.flush()
+
+    def Close(self):
+        self.Flush()
+        self.File.close()
+
+# 读取ResultSink写出的文件, 返回二维int64数组, 列与CarFields或TickFields相同
+def LoadResults(FileName, Fields=CarFields):
+    if FileName.endswith('.bin'):
+        return np.fromfile(FileName, '<i8').reshape(-1, len(Fields)).astype(np.int64)
+    Table = np.loadtxt(FileName, np.int64, delimiter=',', skiprows=1, ndmin=2)
+    return Table.reshape(-1, len(Fields))
+
+# 代替CarObjHasEnd列表: 到达的车辆在时间片结束时写入文件后即被丢弃, 内存占用不随已到达车辆数增长
+class ResultSinkClass(object):
+    def __init__(self, CarFile, TickFile=None, CarArray=None, BufferSize=65536):
+        '''
+        CarFile: 到达车辆的记录文件, 每辆车一行(CarFields), 到达时间的计法与RunSimulation的ArriveTimes相同,
+                 行驶时间为到达时间减去Answer中的出发时间
+        TickFile: 不为None时每个时间片写一行路网上, 车库中与已到达的车辆数(TickFields);
+                  事件驱动跳过的空时间片也各写一行, 路网上与车库中的车辆数均为0, 因此NowTime连续没有缺失
+        CarArray: 'array'模式下车辆为CarArray中的index, 由此读取车辆信息;
+                  通过Simulator.SimulatorClass.Load使用时自动设置
+        以本对象作为CarObjHasEnd传给RunSimulation, 调度过程只调用append与len; 已到达车辆不再保留,
+        因此不能再对该调度状态调用Snapshot.TakeSnapshot. 死锁时只记录死锁之前完整的时间片中到达的车辆
+        '''
+        self.CarWriter = RecordWriterClass(CarFile, CarFields, BufferSize)
+        self.TickWriter = None if TickFile is None else RecordWriterClass(TickFile, TickFields, BufferSize)
+        self.CarArray = CarArray
+        # 当前时间片中到达, 还未写出的车辆
+        self.Pending = []
+        self.EndNum = 0
+        self.TotalTravelTime = 0
+
+    def append(self, Car):
+        self.Pending.append(Car)
+
+    def __len__(self):
+        return self.EndNum + len(self.Pending)
+
+    # 由RunSimulation在每个时间片结束时调用, NowTime为该时间片到达车辆的到达时间
+    def EndTick(self, NowTime, CarNum, CarObjToStart, CrossObjList, ActiveSet):
+        '''
+        CarNum: 车辆总数, 用于计算路网上的车辆数
+        '''
+        if len(self.Pending):
+            if self.CarArray is None:
+                Records = [(Car.Number, NowTime, NowTime - Car.StartTime, len(Car.Route)) for Car in self.Pending]
+            else:
+                Cars = np.array(self.Pending, np.int64)
+                CarArray = self.CarArray
+                Records = np.stack([CarArray.Number[Cars], np.full(len(Cars), NowTime, np.int64),
+                                    NowTime - CarArray.StartTime[Cars],
+                                    CarArray.RouteOffsets[Cars + 1] - CarArray.RouteOffsets[Cars]], 1).tolist()
+            self.CarWriter.Write(Records)
+            self.TotalTravelTime += sum([Record[2] for Record in Records])
+            self.EndNum += len(self.Pending)
+            self.Pending = []
+        if self.TickWriter is not None:
+            InGarage = sum([CrossObjList[CrossIdx].GarageCarNum for CrossIdx in ActiveSet.GarageCrosses])
+            self.TickWriter.Write([(NowTime, CarNum - len(CarObjToStart) - InGarage - self.EndNum, InGarage,
+                                    self.EndNum)])
+
+    # 由RunSimulation在事件驱动跳过时间片时调用, 为时间片NowTime到SkipTo - 1各写一行,
+    # 与EndTick相同以时间片结束后的时间NowTime + 1到SkipTo记录
+    def SkipTicks(self, NowTime, SkipTo):
+        if self.TickWriter is not None and SkipTo > NowTime:
+            Rows = np.zeros((SkipTo - NowTime, len(TickFields)), np.int64)
+            Rows[:, 0] = np.arange(NowTime + 1, SkipTo + 1)
+            Rows[:, 3] = self.EndNum
+            self.TickWriter.Write(Rows.tolist())
+
+    def Close(self):
+        self.CarWriter.Close()
+        if self.TickWriter is not None:
+            self.TickWriter.Close()
@@ -1,6 +1,105 @@
 # coding=utf-8
 import numpy as np
 import time
+from collections import deque
+from itertools import islice
+
+from Loader import LoadTable, LoadAnswer
+from ResultSink import ResultSinkClass
+
+# 死锁异常, 信息以'ErrorDeadLock'开头
+class DeadLockError(Exception):
+    def __init__(self, LockedCrosses, Cycle=None):
+        '''
+        LockedCrosses: 死锁路口的编号列表
+        Cycle: 由等待图发现死锁时为环上的阻塞关系列表, 每个元素为
+               (道路编号, 车道, 车辆编号, 下一条道路编号, 下一条道路的车道, 阻塞它的车辆编号),
+               同一条双向道路的两个方向编号相同;
+               由一轮调度中没有车辆行驶判定的死锁为None
+        '''
+        Message = 'ErrorDeadLock, The locked crosses are: ' + str(LockedCrosses)
+        if Cycle is not None:
+            Message += ', cycle: ' + ' -> '.join(['road %d channel %d car %d blocked by road %d channel %d car %d' % Block
+                                                  for Block in Cycle])
+        super(DeadLockError, self).__init__(Message)
+        self.LockedCrosses = LockedCrosses
+        self.Cycle = Cycle
+        # 发生死锁的时间片, 由RunSimulation设置
+        self.NowTime = None
+
+# 等待图: 路口调度时, 道路的第一优先级车辆因下一条道路某车道末尾的车辆处于等待状态而无法驶入, 记一条边
+# 每条道路最多一条出边, 新增边时沿出边查找, 回到起点即形成环, 环上的车辆在本时间片内都不可能再行驶
+class WaitForGraphClass(object):
+    def __init__(self, RoadNum):
+        # 道路上有车辆驶入, 驶离或进入终止状态时版本号加1, 以该道路为起点或终点的旧边随之失效
+        self.Version = [0] * RoadNum
+        self.Edges = {}
+        # 本时间片发现的环, 元素为(道路index, 车道, 车辆编号, 下一条道路index, 下一条道路的车道, 阻塞它的车辆编号)
+        self.Cycle = None
+
+    def Clear(self):
+        self.Edges.clear()
+        self.Cycle = None
+
+    def Update(self, Road):
+        self.Version[Road] += 1
+
+    def IsValid(self, Road, Edge):
+        return Edge[-2] == self.Version[Road] and Edge[-1] == self.Version[Edge[2]]
+
+    # 记录Road被阻塞, 如果形成环则记录在Cycle中
+    def AddBlock(self, Road, Channel, Car, NextRoad, NextChannel, BlockCar):
+        '''
+        Road, NextRoad: 道路index; Channel, NextChannel: 车道; Car, BlockCar: 被阻塞与阻塞它的车辆编号
+        '''
+        self.Edges[Road] = (Channel, Car, NextRoad, NextChannel, BlockCar, self.Version[Road], self.Version[NextRoad])
+        Cycle = [Road]
+        while NextRoad != Road:
+            Edge = self.Edges.get(NextRoad)
+            if Edge is None or not self.IsValid(NextRoad, Edge) or len(Cycle) > len(self.Edges):
+                return
+            Cycle.append(NextRoad)
+            NextRoad = Edge[2]
+        self.Cycle = [(Road, ) + self.Edges[Road][:5] for Road in Cycle]
+
+# 调度工作表: 记录当前有车的道路, 需要调度的路口以及车库非空的路口, 调度时只访问这些对象
+class ActiveSetClass(object):
+    def __init__(self, RoadNum):
+        self.Roads = set()
+        self.Crosses = set()
+        self.GarageCrosses = set()
+        # 路口调度阶段的等待图, 每个时间片开始路口调度时清空
+        self.WaitForGraph = WaitForGraphClass(RoadNum)
+
+# 出发队列: 车辆按出发时间分桶, 每个时间片一次取出该时刻出发的全部车辆
+class DepartureQueueClass(object):
+    def __init__(self, Cars, StartTimes):
+        '''
+        Cars: 按出发时间排序的车辆, 对象模式下为CarClass对象, 数组模式下为车辆index
+        StartTimes: 与Cars一一对应的出发时间, 非递减
+        同一出发时间的车辆保持Cars中的顺序
+        '''
+        StartTimes = np.asarray(StartTimes, np.int64)
+        Bounds = [0] + (np.flatnonzero(np.diff(StartTimes)) + 1).tolist() + [len(Cars)] if len(Cars) else [0]
+        self.Batches = deque((int(StartTimes[Bounds[i]]), Cars[Bounds[i]:Bounds[i + 1]]) \
+                             for i in range(len(Bounds) - 1))
+        self.CarNum = len(Cars)
+
+    # 尚未出发的车辆数
+    def __len__(self):
+        return self.CarNum
+
+    # 下一批车辆的出发时间, 队列不能为空
+    def NextStartTime(self):
+        return self.Batches[0][0]
+
+    # 取出出发时间为NowTime的全部车辆, 没有则返回空列表
+    def PopBatch(self, NowTime):
+        if len(self.Batches) and self.Batches[0][0] == NowTime:
+            _, Batch = self.Batches.popleft()
+            self.CarNum -= len(Batch)
+            return Batch
+        return []
 
 class CarClass(object):
     def __init__(self, Car, TimeAndRoute, CrossToIdx, CrossRoadToNext, CrossAdjacency):
@@ -13,6 +112,9 @@ class CarClass(object):
         self.RoutePosition = 0
         self.NextRoad = self.Route[0]
         self.StartCross = CrossToIdx[Car[1]]
+        # 由CrossTableClass预先计算: 起点道路在起点路口EntranceRoads中的位置, 以及路线每一步的路口查找结果
+        self.StartSlot = -1
+        self.RouteSteps = []
 
     # 根据Answer返回行车路线，Road标签为整合后Road列表的Index    
     @staticmethod
@@ -47,14 +149,35 @@ class CarClass(object):
         self.Position = PositionNextRoad
 
 class RoadClass(object):
-    def __init__(self, Road):
+    def __init__(self, Road, RoadIdx, FromCross, ToCross, ActiveSet):
+        self.RoadIdx = RoadIdx
+        self.RoadNum = Road[0]
         self.Length = Road[1]
         self.MaxVelocity = Road[2]
         self.NumChannel = Road[3]
-        self.Cars = [[] for _ in range(self.NumChannel)]
-        self.WaitChannels = set([i for i in range(self.NumChannel)])
+        # 道路起点与终点路口在路口列表中的index
+        self.FromCross = FromCross
+        self.ToCross = ToCross
+        # 每个车道为一个deque, 车道尾部(Channel[-1])为最前方的车辆, 车辆驶入与驶离均为O(1)
+        self.Cars = [deque() for _ in range(self.NumChannel)]
+        # 道路上的车辆总数, 为0时该道路不在工作表中
+        self.CarNum = 0
+        self.ActiveSet = ActiveSet
+        self.WaitChannels = set()
         self.WaitFirstPriority = -1
 
+    # 车辆驶入道路, 道路由空变为有车时加入工作表
+    def CarEnter(self):
+        self.CarNum += 1
+        if self.CarNum == 1:
+            self.ActiveSet.Roads.add(self.RoadIdx)
+
+    # 车辆驶离道路, 道路变空时移出工作表
+    def CarLeave(self):
+        self.CarNum -= 1
+        if self.CarNum == 0:
+            self.ActiveSet.Roads.discard(self.RoadIdx)
+
     # 将路径上的所有车辆设为等待状态, 每次调度正式开始前执行
     def SetAllCarWait(self):
         for Channel in self.Cars:
@@ -77,6 +200,9 @@ class RoadClass(object):
             self.UpdateTerminalStateChannel(ChannelIdx, Channel)
         # print('sb', self.WaitChannels)
         self.UpdateFirstPriority()
+        # 有等待车辆时, 道路终点路口需要参与本时间片的路口调度
+        if self.WaitFirstPriority != -1:
+            self.ActiveSet.Crosses.add(self.ToCross)
 
     # 将一条Channel上能更新为终止状态的车辆都更新为终止状态
     def UpdateTerminalStateChannel(self, ChannelIdx, Channel):
@@ -94,10 +220,9 @@ class RoadClass(object):
             elif ChannelIdx in self.WaitChannels:
                 self.WaitChannels.remove(ChannelIdx)
                     
-            for CarIdx in range(len(Channel) - 2, -1, -1):
-                CarEarly = Channel[CarIdx + 1]
-                CarLater = Channel[CarIdx]
-                    
+            # 从前往后依次处理每辆车, deque中间位置的下标访问为O(n), 因此顺序迭代并记录前车
+            CarEarly = CarEnd
+            for CarLater in islice(reversed(Channel), 1, None):
                 if CarLater.IfWait:
                     MaxMoveDistance = CarEarly.Position - CarLater.Position - 1
                     MaxVelocity = min(self.MaxVelocity, CarLater.MaxVelocity)
@@ -107,61 +232,158 @@ class RoadClass(object):
                     elif not CarEarly.IfWait:
                         CarLater.Position += MaxMoveDistance
                         CarLater.IfWait = False
+                CarEarly = CarLater
         elif ChannelIdx in self.WaitChannels:
             self.WaitChannels.remove(ChannelIdx)
 
+# 路口查找表: 构建地图时一次性计算, 调度时用O(1)的数组查找代替list.index
+class CrossTableClass(object):
+    # 车辆从路口某方向的道路驶出并驶入另一方向的道路时的转向优先级, 0直行, 1左转, 2右转, -1掉头
+    PositionCrossToTurnIdx = np.array([[-1, 1, 0, 2], [2, -1, 1, 0],
+                                       [0, 2, -1, 1], [1, 0, 2, -1]], np.int64)
+
+    def __init__(self, RoadDirList, CrossList, CrossAdjacency):
+        '''
+        RoadDirList: 有向道路列表, 元素为(Road, RoadIdx, 起点路口index, 终点路口index)
+        CrossList: cross.txt中的路口列表
+        CrossAdjacency: 路口邻接矩阵
+        '''
+        RoadNum = len(RoadDirList)
+        CrossNum = len(CrossList)
+        self.FromCross = np.array([RoadDir[2] for RoadDir in RoadDirList], np.int64)
+        self.ToCross = np.array([RoadDir[3] for RoadDir in RoadDirList], np.int64)
+        # 道路在起点路口与终点路口的cross.txt记录中的方向位置(0-3)
+        self.FromPosition = np.array([CrossList[FromCross][1:].index(Road[0]) \
+                                      for Road, _, FromCross, _ in RoadDirList], np.int64)
+        self.ToPosition = np.array([CrossList[ToCross][1:].index(Road[0]) \
+                                    for Road, _, _, ToCross in RoadDirList], np.int64)
+
+        # 每个路口的ExitRoads(驶向该路口的道路)与EntranceRoads(从该路口出发的道路), 均按道路index排序
+        FromIdx, ToIdx = np.nonzero(CrossAdjacency >= 0)
+        RoadIdx = CrossAdjacency[FromIdx, ToIdx]
+        self.ExitRoads, self.ExitSlot = self.GroupRoads(ToIdx, RoadIdx, CrossNum, RoadNum)
+        self.EntranceRoads, self.EntranceSlot = self.GroupRoads(FromIdx, RoadIdx, CrossNum, RoadNum)
+
+    # 按路口对道路分组, 返回每个路口的道路列表, 以及每条道路在其所在组中的位置(slot)
+    @staticmethod
+    def GroupRoads(CrossIdx, RoadIdx, CrossNum, RoadNum):
+        Order = np.lexsort((RoadIdx, CrossIdx))
+        CrossIdx, RoadIdx = CrossIdx[Order], RoadIdx[Order]
+        GroupStart = np.searchsorted(CrossIdx, np.arange(CrossNum + 1))
+        Slot = -np.ones(RoadNum, np.int64)
+        Slot[RoadIdx] = np.arange(len(RoadIdx)) - GroupStart[CrossIdx]
+        RoadIdx = RoadIdx.tolist()
+        Roads = [RoadIdx[GroupStart[Cross]:GroupStart[Cross + 1]] for Cross in range(CrossNum)]
+        return Roads, Slot
+
+    # 计算路线上每一步的路口查找结果
+    def GetRouteSteps(self, RouteFlat, RouteOffsets):
+        '''
+        RouteFlat, RouteOffsets: 所有车辆路线拼接成的数组, 第i辆车的路线为RouteFlat[RouteOffsets[i]:RouteOffsets[i + 1]]
+        返回与RouteFlat等长的四个数组, 车辆从路线第k条道路驶向第k + 1条道路时:
+        Cross: 所经过的路口
+        ExitSlot: 第k条道路在该路口ExitRoads中的位置
+        EntranceSlot: 第k + 1条道路在该路口EntranceRoads中的位置, 最后一条道路为-1
+        Turn: 转向优先级, 最后一条道路为-1
+        '''
+        RouteFlat = np.asarray(RouteFlat, np.int64)
+        IsLast = np.zeros(len(RouteFlat), np.bool_)
+        IsLast[np.asarray(RouteOffsets[1:]) - 1] = True
+        NextRoad = np.roll(RouteFlat, -1)
+        Cross = self.ToCross[RouteFlat]
+        ExitSlot = self.ExitSlot[RouteFlat]
+        EntranceSlot = np.where(IsLast, -1, self.EntranceSlot[NextRoad])
+        Turn = np.where(IsLast, -1, self.PositionCrossToTurnIdx[self.ToPosition[RouteFlat],
+                                                                self.FromPosition[NextRoad]])
+        return Cross, ExitSlot, EntranceSlot, Turn
+
+    # 为对象模式下的车辆设置StartSlot与RouteSteps
+    def SetCarRouteSteps(self, CarObjList):
+        RouteOffsets = np.zeros(len(CarObjList) + 1, np.int64)
+        RouteOffsets[1:] = np.cumsum([len(Car.Route) for Car in CarObjList])
+        RouteFlat = [Road for Car in CarObjList for Road in Car.Route]
+        RouteSteps = list(zip(*[Array.tolist() for Array in self.GetRouteSteps(RouteFlat, RouteOffsets)]))
+        RouteOffsets = RouteOffsets.tolist()
+        for CarIdx, Car in enumerate(CarObjList):
+            Car.StartSlot = int(self.EntranceSlot[Car.Route[0]])
+            Car.RouteSteps = RouteSteps[RouteOffsets[CarIdx]:RouteOffsets[CarIdx + 1]]
+
 class CrossClass(object):
-    def __init__(self, RoadUniList, Cross, CrossToIdx, CrossAdjacency):
+    def __init__(self, CrossTable, Cross, CrossToIdx, ActiveSet):
         self.CrossNum = Cross[0]
-        self.ExitRoads, self.EntranceRoads, self.RoadsToTurnIdx = self.OrganizeCrossCont(RoadUniList,
-                                                                  Cross, CrossToIdx, CrossAdjacency)
+        self.CrossIdx = CrossToIdx[Cross[0]]
+        self.ExitRoads, self.EntranceRoads, self.RoadsToTurnIdx = self.OrganizeCrossCont(CrossTable, self.CrossIdx)
         self.ExitRoadsNum = len(self.ExitRoads)
         self.EntrancePriority = [3 for _ in self.EntranceRoads]
         self.ExitRoadsWaitSchedule = self.ExitRoads
         self.ExitRoadsWaitScheduleMask = [True for _ in self.ExitRoads]
-        self.WaitSchedule = True
-        self.UnlimitedGarage = [[] for _ in self.EntranceRoads]
+        self.WaitSchedule = False
+        # 每条入口道路一个先进先出的车库队列
+        self.UnlimitedGarage = [deque() for _ in self.EntranceRoads]
+        # 车库中等待上路的车辆总数, 不为0时路口在工作表中
+        self.GarageCarNum = 0
+        self.ActiveSet = ActiveSet
 
     # 整合路口的相关信息
     @staticmethod 
-    def OrganizeCrossCont(RoadUniList, Cross, CrossToIdx, CrossAdjacency):
+    def OrganizeCrossCont(CrossTable, CrossIdx):
         '''
         返回值:
         ExitRoads: 路口处可能驶出车辆的道路列表
         EntranceRoads: 路口处可能驶入车辆的道路列表
         RoadsToTurnIdx: 给定路口处车辆驶出的道路在ExitRoads中的idx以及车辆驶入道路在EntranceRoads中的idx, 可以获得转向标签(直行, 左转, 右转)
         '''
-        CrossIdx = CrossToIdx[Cross[0]]
-        ExitRoads = CrossAdjacency[:, CrossIdx][CrossAdjacency[:, CrossIdx] >= 0].tolist()
-        ExitRoads.sort()
-        EntranceRoads = CrossAdjacency[CrossIdx][CrossAdjacency[CrossIdx] >= 0].tolist()
-        EntranceRoads.sort()
-        PositionCrossToTurnIdx = np.array([[-1, 1, 0, 2], [2, -1, 1, 0], 
-                                           [0, 2, -1, 1], [1, 0, 2, -1]])
-        RoadsToTurnIdx = -np.ones((len(ExitRoads), len(EntranceRoads)), np.int)
-        for ExitIdx, ExitRoad in enumerate(ExitRoads):
-            for EntranceIdx, EntranceRoad in enumerate(EntranceRoads):
-                PositionCrossExit = Cross[1:].index(eval(RoadUniList[ExitRoad][1:]))
-                PositionCrossEntrance = Cross[1:].index(eval(RoadUniList[EntranceRoad][1:]))
-                RoadsToTurnIdx[ExitIdx, EntranceIdx] = PositionCrossToTurnIdx[PositionCrossExit, \
-                                                                              PositionCrossEntrance]
+        ExitRoads = CrossTable.ExitRoads[CrossIdx]
+        EntranceRoads = CrossTable.EntranceRoads[CrossIdx]
+        RoadsToTurnIdx = CrossTable.PositionCrossToTurnIdx[CrossTable.ToPosition[ExitRoads][:, None],
+                                                           CrossTable.FromPosition[EntranceRoads][None, :]]
         return ExitRoads, EntranceRoads, RoadsToTurnIdx
         
 
+    # 调度循环只通过以下方法读写车辆状态, CrossArrayClass重写它们以共用ScheduleRoads
+    def GetCarNextRoad(self, Car):
+        return Car.NextRoad
+
+    def GetCarTurn(self, Car):
+        '''
+        返回值:
+        EntranceRoadIdx: 下一条道路在本路口EntranceRoads中的idx, 没有下一条道路时为-1
+        TurnIdx: 转向优先级
+        '''
+        _, _, EntranceRoadIdx, TurnIdx = Car.RouteSteps[Car.RoutePosition]
+        return EntranceRoadIdx, TurnIdx
+
+    def GetCarPosition(self, Car):
+        return Car.Position
+
+    def GetCarIfWait(self, Car):
+        return Car.IfWait
+
+    def GetCarNumber(self, Car):
+        return Car.Number
+
+    # 车辆无法驶出路口, 停在当前道路末端
+    def StopCarAtRoadEnd(self, Car, Length):
+        Car.Position = Length - 1
+        Car.IfWait = False
+
+    # 车辆已放入下一条道路的车道, 更新其位置与路线状态
+    def MoveCarToNextRoad(self, Car, Position):
+        Car.IfWait = False
+        Car.UpdateStateToNextRoad(Position)
+
     def UpdateEntrancePriority(self, RoadsList):
+        GetCarTurn = self.GetCarTurn
         self.EntrancePriority = [3 for _ in self.EntranceRoads]
         for ExitRoad in self.ExitRoadsWaitSchedule:
-            ExitRoadIdx = self.ExitRoads.index(ExitRoad)
             ExitRoadObj = RoadsList[ExitRoad]
             ExitRoadObj.UpdateFirstPriority()
             # print(ExitRoadObj.WaitChannels)
             # print(ExitRoadObj.WaitFirstPriority)
             if ExitRoadObj.WaitFirstPriority != -1:
-                EntranceRoad = ExitRoadObj.Cars[ExitRoadObj.WaitFirstPriority][-1].NextRoad
-                if EntranceRoad != -1:
-                    EntranceRoadIdx = self.EntranceRoads.index(EntranceRoad)
-                    self.EntrancePriority[EntranceRoadIdx] = min(self.RoadsToTurnIdx[ExitRoadIdx, EntranceRoadIdx],
-                                                                 self.EntrancePriority[EntranceRoadIdx])
+                EntranceRoadIdx, TurnIdx = GetCarTurn(ExitRoadObj.Cars[ExitRoadObj.WaitFirstPriority][-1])
+                if EntranceRoadIdx != -1:
+                    self.EntrancePriority[EntranceRoadIdx] = min(TurnIdx, self.EntrancePriority[EntranceRoadIdx])
 
     def UpdateExitRoadsWaitSchedule(self, RoadsList):
         self.ExitRoadsWaitSchedule = [Road for Road in self.ExitRoads if RoadsList[Road].WaitFirstPriority != -1]
@@ -175,28 +397,38 @@ class CrossClass(object):
                 for Channel in RoadObj.Cars:
                     if len(Channel):
                         if Channel[0].Position != 0:
-                            Channel.insert(0, RoadGarage.pop(0))
+                            Channel.appendleft(RoadGarage.popleft())
+                            RoadObj.CarEnter()
+                            self.GarageCarNum -= 1
                             Car = Channel[0]
                             Car.Position = min(Car.MaxVelocity, RoadObj.MaxVelocity,
                                                Channel[1].Position) - 1
                             Car.IfWait = False
-                            Car.NextRoad = Car.Route[1]
+                            Car.NextRoad = Car.Route[1] if len(Car.Route) > 1 else -1
                             CarHasAdd = True
                             break
                         else:
                             continue
                     else:
-                        Channel.insert(0, RoadGarage.pop(0))
+                        Channel.appendleft(RoadGarage.popleft())
+                        RoadObj.CarEnter()
+                        self.GarageCarNum -= 1
                         Car = Channel[0]
                         Car.Position = min(Car.MaxVelocity, RoadObj.MaxVelocity) - 1
                         Car.IfWait = False
-                        Car.NextRoad = Car.Route[1]
+                        Car.NextRoad = Car.Route[1] if len(Car.Route) > 1 else -1
                         CarHasAdd = True
                         break
                 if CarHasAdd == False:
                     break
+        if self.GarageCarNum == 0:
+            self.ActiveSet.GarageCrosses.discard(self.CrossIdx)
 
     def ScheduleRoads(self, RoadsList, CarObjHasEnd, LockCheckSymbol):
+        GetCarNextRoad, GetCarTurn = self.GetCarNextRoad, self.GetCarTurn
+        GetCarPosition, GetCarIfWait = self.GetCarPosition, self.GetCarIfWait
+        StopCarAtRoadEnd, MoveCarToNextRoad = self.StopCarAtRoadEnd, self.MoveCarToNextRoad
+        WaitForGraph = self.ActiveSet.WaitForGraph
         self.WaitSchedule = False
         self.UpdateExitRoadsWaitSchedule(RoadsList)
 
@@ -208,7 +440,6 @@ class CrossClass(object):
             # 针对每条出口道路调度一圈
             for IdxInWaitSchedule, ExitRoad in enumerate(self.ExitRoadsWaitSchedule):
                 self.UpdateEntrancePriority(RoadsList)
-                ExitRoadIdx = self.ExitRoads.index(ExitRoad)
                 ExitRoadObj = RoadsList[ExitRoad]
                 # 将该条出口道路调度至优先级不够或对应入口路无法进车或已经调度完
                 # print('sb')
@@ -216,10 +447,12 @@ class CrossClass(object):
                     # print('sb')
                     ExitChannel = ExitRoadObj.Cars[ExitRoadObj.WaitFirstPriority]
                     Car = ExitChannel[-1]
-                    EntranceRoad = Car.NextRoad
+                    EntranceRoad = GetCarNextRoad(Car)
                     if EntranceRoad == -1:
-                        CarObjHasEnd.append(ExitChannel.pop(-1))
+                        CarObjHasEnd.append(ExitChannel.pop())
+                        ExitRoadObj.CarLeave()
                         LockCheckSymbol = False
+                        WaitForGraph.Update(ExitRoad)
                         ExitRoadObj.UpdateTerminalStateChannel(ExitRoadObj.WaitFirstPriority, ExitChannel)
                         ExitRoadObj.UpdateFirstPriority()
                         if ExitRoadObj.WaitFirstPriority < 0:
@@ -227,20 +460,18 @@ class CrossClass(object):
                             break
                         continue
                         
-                    EntranceRoadIdx = self.EntranceRoads.index(EntranceRoad)
+                    EntranceRoadIdx, TurnIdx = GetCarTurn(Car)
                     EntranceRoadObj = RoadsList[EntranceRoad]
                     
                     # 如果当前转向的优先级等于入口最大优先级，则进行调度
-                    # print('ddd', self.RoadsToTurnIdx[ExitRoadIdx, EntranceRoadIdx], self.EntrancePriority[EntranceRoadIdx])
-                    # print('dddd', )
-                    if self.RoadsToTurnIdx[ExitRoadIdx, EntranceRoadIdx] <= self.EntrancePriority[EntranceRoadIdx]:
+                    if TurnIdx <= self.EntrancePriority[EntranceRoadIdx]:
 
-                        MaxExitDistance = ExitRoadObj.Length - Car.Position - 1
+                        MaxExitDistance = ExitRoadObj.Length - GetCarPosition(Car) - 1
                         MaxEntranceDistance = max(EntranceRoadObj.MaxVelocity - MaxExitDistance, 0)
                         # 速度限制使车辆无法调度到下条路的情况
                         if MaxEntranceDistance == 0:
-                            Car.Position = ExitRoadObj.Length - 1
-                            Car.IfWait = False
+                            StopCarAtRoadEnd(Car, ExitRoadObj.Length)
+                            WaitForGraph.Update(ExitRoad)
                             ExitRoadObj.UpdateTerminalStateChannel(ExitRoadObj.WaitFirstPriority, ExitChannel)
                             ExitRoadObj.UpdateFirstPriority()
                             if ExitRoadObj.WaitFirstPriority < 0:
@@ -249,31 +480,40 @@ class CrossClass(object):
                             continue
                         # 尝试向入口路的每个车道调车，按车道idx从小到大
                         for EntranceChannelIdx, EntranceChannel in enumerate(EntranceRoadObj.Cars):
-                            if len(EntranceChannel) == 0 or EntranceChannel[0].Position >= MaxEntranceDistance:
-                                EntranceChannel.insert(0, ExitChannel.pop(-1))
+                            if len(EntranceChannel) == 0 or GetCarPosition(EntranceChannel[0]) >= MaxEntranceDistance:
+                                EntranceChannel.appendleft(ExitChannel.pop())
+                                ExitRoadObj.CarLeave()
+                                EntranceRoadObj.CarEnter()
+                                WaitForGraph.Update(EntranceRoad)
                                 LockCheckSymbol = False
-                                EntranceChannel[0].IfWait = False
-                                EntranceChannel[0].UpdateStateToNextRoad(MaxEntranceDistance - 1)
+                                MoveCarToNextRoad(Car, MaxEntranceDistance - 1)
+                                WaitForGraph.Update(ExitRoad)
                                 ExitRoadObj.UpdateTerminalStateChannel(ExitRoadObj.WaitFirstPriority, ExitChannel)
                                 ExitRoadObj.UpdateFirstPriority()
                                 break
-                            elif EntranceChannel[0].IfWait:
+                            elif GetCarIfWait(EntranceChannel[0]):
                                 # 让出口路径变为不可调度
                                 self.ExitRoadsWaitScheduleMask[IdxInWaitSchedule] = False
                                 self.WaitSchedule = True
+                                WaitForGraph.AddBlock(ExitRoad, ExitRoadObj.WaitFirstPriority, self.GetCarNumber(Car),
+                                                      EntranceRoad, EntranceChannelIdx,
+                                                      self.GetCarNumber(EntranceChannel[0]))
                                 break
-                            elif EntranceChannel[0].Position > 0:
-                                EntranceChannel.insert(0, ExitChannel.pop(-1))
+                            elif GetCarPosition(EntranceChannel[0]) > 0:
+                                EntranceChannel.appendleft(ExitChannel.pop())
+                                ExitRoadObj.CarLeave()
+                                EntranceRoadObj.CarEnter()
+                                WaitForGraph.Update(EntranceRoad)
                                 LockCheckSymbol = False
-                                EntranceChannel[0].IfWait = False
-                                EntranceChannel[0].UpdateStateToNextRoad(EntranceChannel[1].Position - 1)
+                                MoveCarToNextRoad(Car, GetCarPosition(EntranceChannel[1]) - 1)
+                                WaitForGraph.Update(ExitRoad)
                                 ExitRoadObj.UpdateTerminalStateChannel(ExitRoadObj.WaitFirstPriority, ExitChannel)
                                 ExitRoadObj.UpdateFirstPriority()
                                 break
                             elif EntranceChannelIdx == EntranceRoadObj.NumChannel - 1:
                                 # print('sb')
-                                Car.Position = ExitRoadObj.Length - 1
-                                Car.IfWait = False
+                                StopCarAtRoadEnd(Car, ExitRoadObj.Length)
+                                WaitForGraph.Update(ExitRoad)
                                 ExitRoadObj.UpdateTerminalStateChannel(ExitRoadObj.WaitFirstPriority, ExitChannel)
                                 ExitRoadObj.UpdateFirstPriority()
                                 
@@ -296,139 +536,226 @@ class CrossClass(object):
         return LockCheckSymbol and self.WaitSchedule
 
 
-def FromFileToObj(RoadFile, CrossFile, CarFile, AnswerFile):
-
-    with open(CarFile) as f:
-        CarList = f.readlines()[1:]
-        CarList = [eval(Car.strip('\n')) for Car in CarList]
-
-    with open(RoadFile) as f:
-        RoadList = f.readlines()[1:]
-        RoadList = [eval(Road.strip('\n')) for Road in RoadList]
-
-    with open(CrossFile) as f:
-        CrossList = f.readlines()[1:]
-        CrossList = [eval(Cross.strip('\n')) for Cross in CrossList]
-
-    with open(AnswerFile) as f:
-        AnswerList = f.readlines()[1:]
-        AnswerList = [eval(Answer.strip('\n')) for Answer in AnswerList]
-
-    CrossUniList = [Cross[0] for Cross in CrossList]
-    CrossToIdx = dict([(Cross[0], CrossIdx) for CrossIdx, Cross in enumerate(CrossList)])
-    CrossAdjacency = - np.ones((len(CrossList), len(CrossList)), np.int)
-    CrossRoadToNext = []
-    
-    RoadToIdx = []
-    RoadUniList = []
-    RoadObjList = []
-    # RoadObjList = [RoadClass(Road) for Road in RoadList]
-    RoadIdx = 0
-    for Road in RoadList:
-        CrossRoadToNext.append(((Road[4], Road[0]), Road[5]))
-        if Road[-1]:
-            RoadUniList.append('p' + str(Road[0]))
-            RoadToIdx.append(('p' + str(Road[0]), RoadIdx))
-            RoadObjList.append(RoadClass(Road))
-            CrossRoadToNext.append(((Road[4], Road[0]), Road[5]))
-            CrossAdjacency[CrossToIdx[Road[4]], CrossToIdx[Road[5]]] = RoadIdx
-            RoadIdx += 1
-            RoadUniList.append('n' + str(Road[0]))
-            RoadToIdx.append(('n' + str(Road[0]), RoadIdx))
-            RoadObjList.append(RoadClass(Road))
-            CrossRoadToNext.append(((Road[5], Road[0]), Road[4]))
-            CrossAdjacency[CrossToIdx[Road[5]], CrossToIdx[Road[4]]] = RoadIdx
-            RoadIdx += 1      
-        else:
-            RoadUniList.append('p' + str(Road[0]))
-            RoadToIdx.append(('p' + str(Road[0]), RoadIdx))
-            RoadObjList.append(RoadClass(Road))
+# 地图: 由road.txt, cross.txt, car.txt构建, 调度过程中不会被修改, 可供多个Answer共用
+class MapClass(object):
+    def __init__(self, RoadList, CrossList, CarTable):
+        '''
+        RoadList, CrossList: road.txt与cross.txt中的记录列表
+        CarTable: car.txt中的车辆表, 每行为(id, from, to, speed, planTime)
+        '''
+        self.RoadList = RoadList
+        self.CrossList = CrossList
+        self.CarTable = CarTable
+        self.CrossToIdx = dict([(Cross[0], CrossIdx) for CrossIdx, Cross in enumerate(CrossList)])
+        self.CrossAdjacency = - np.ones((len(CrossList), len(CrossList)), np.int64)
+        CrossToIdx, CrossAdjacency = self.CrossToIdx, self.CrossAdjacency
+        CrossRoadToNext = []
+
+        # 有向道路列表, 元素为(Road, RoadIdx, 起点路口index, 终点路口index)
+        self.RoadDirList = []
+        RoadIdx = 0
+        for Road in RoadList:
             CrossRoadToNext.append(((Road[4], Road[0]), Road[5]))
+            self.RoadDirList.append((Road, RoadIdx, CrossToIdx[Road[4]], CrossToIdx[Road[5]]))
             CrossAdjacency[CrossToIdx[Road[4]], CrossToIdx[Road[5]]] = RoadIdx
             RoadIdx += 1
-    RoadToIdx = dict(RoadToIdx) 
-    CrossRoadToNext = dict(CrossRoadToNext)
-    CrossObjList = [CrossClass(RoadUniList, Cross, CrossToIdx, CrossAdjacency) for Cross in CrossList]
-
-    CarObjList = [CarClass(Car, TimeAndRoute, CrossToIdx, CrossRoadToNext, CrossAdjacency) \
-                  for Car, TimeAndRoute in zip(CarList, AnswerList)]
-
-    CarObjToStart = CarObjList
-    SortedStartCarIdx = np.array([Car.StartTime for Car in CarObjToStart]).argsort().tolist()
-    CarObjToStart = [CarObjToStart[CarIdx] for CarIdx in SortedStartCarIdx]
+            if Road[-1]:
+                self.RoadDirList.append((Road, RoadIdx, CrossToIdx[Road[5]], CrossToIdx[Road[4]]))
+                CrossRoadToNext.append(((Road[5], Road[0]), Road[4]))
+                CrossAdjacency[CrossToIdx[Road[5]], CrossToIdx[Road[4]]] = RoadIdx
+                RoadIdx += 1
+        self.CrossRoadToNext = dict(CrossRoadToNext)
+        self.CrossTable = CrossTableClass(self.RoadDirList, CrossList, CrossAdjacency)
+
+# 读取地图文件, 构建MapClass
+def LoadMap(RoadFile, CrossFile, CarFile, UseCache=True):
+    return MapClass(LoadTable(RoadFile, UseCache).tolist(), LoadTable(CrossFile, UseCache).tolist(),
+                    LoadTable(CarFile, UseCache))
+
+# 由地图与一份Answer构建调度所需的全部对象, 同一个Map可以多次调用, 每次得到互相独立的调度状态
+def FromMapToObj(Map, AnswerFlat, AnswerOffsets, Engine='object'):
+    '''
+    AnswerFlat, AnswerOffsets: LoadAnswer的返回值, 第i行与car.txt的第i辆车对应
+    Engine: 'object'时每辆车为一个CarClass对象, 为默认模式; 'array'时车辆状态保存在CarArrayClass的数组中,
+            道路与路口中保存的是车辆的index, 内存占用更少, 但路口调度中逐辆车读写NumPy数组, 自带地图上比'object'慢
+    返回值中CarObjToStart为DepartureQueueClass出发队列, CarArray在'object'模式下为None
+    '''
+    ActiveSet = ActiveSetClass(len(Map.RoadDirList))
+    if Engine == 'array':
+        from ArrayEngine import CarArrayClass, RoadArrayClass, CrossArrayClass
+        CarArray = CarArrayClass(Map.CarTable, AnswerFlat, AnswerOffsets, Map.CrossToIdx, Map.CrossRoadToNext,
+                                 Map.CrossAdjacency, Map.CrossTable)
+        RoadObjList = [RoadArrayClass(*RoadDir, ActiveSet, CarArray) for RoadDir in Map.RoadDirList]
+        CarArray.SetRoadArrays(RoadObjList)
+        CrossObjList = [CrossArrayClass(Map.CrossTable, Cross, Map.CrossToIdx, ActiveSet, CarArray) \
+                        for Cross in Map.CrossList]
+        # 与对象模式使用相同的排序, 保证同一时刻出发的车辆进入车库的顺序一致
+        SortedStartCarIdx = CarArray.StartTime.argsort()
+        CarObjToStart = DepartureQueueClass(SortedStartCarIdx.tolist(), CarArray.StartTime[SortedStartCarIdx])
+    elif Engine == 'object':
+        CarArray = None
+        RoadObjList = [RoadClass(*RoadDir, ActiveSet) for RoadDir in Map.RoadDirList]
+        CrossObjList = [CrossClass(Map.CrossTable, Cross, Map.CrossToIdx, ActiveSet) for Cross in Map.CrossList]
+
+        AnswerList = AnswerFlat.tolist()
+        CarObjList = [CarClass(Car, AnswerList[AnswerOffsets[CarIdx]:AnswerOffsets[CarIdx + 1]],
+                               Map.CrossToIdx, Map.CrossRoadToNext, Map.CrossAdjacency) \
+                      for CarIdx, Car in enumerate(Map.CarTable.tolist())]
+        Map.CrossTable.SetCarRouteSteps(CarObjList)
+
+        SortedStartCarIdx = np.array([Car.StartTime for Car in CarObjList]).argsort().tolist()
+        CarObjToStart = [CarObjList[CarIdx] for CarIdx in SortedStartCarIdx]
+        CarObjToStart = DepartureQueueClass(CarObjToStart, [Car.StartTime for Car in CarObjToStart])
+    else:
+        raise ValueError('Unknown engine: ' + str(Engine))
     CarObjHasEnd = []
-    
-    return RoadObjList, CrossObjList, CarObjToStart, CarObjHasEnd
 
-def AddCarToGarage(NowTime, CrossObjList, CarObjToStart):
-    if len(CarObjToStart):
-        Car = CarObjToStart[0]
-        while (NowTime == Car.StartTime):
-            CrossObjAdd = CrossObjList[Car.StartCross]
-            StartRoad = Car.Route[0]
-            StartRoadIdx = CrossObjAdd.EntranceRoads.index(StartRoad)
-            CrossObjAdd.UnlimitedGarage[StartRoadIdx].append(CarObjToStart.pop(0))
-            if len(CarObjToStart):
-                Car = CarObjToStart[0]
-            else:
-                break
-
-
-if __name__ == '__main__':
+    return RoadObjList, CrossObjList, CarObjToStart, CarObjHasEnd, ActiveSet, CarArray
 
-    FileDir = 'config_5'
+def FromFileToObj(RoadFile, CrossFile, CarFile, AnswerFile, Engine='object', UseCache=True):
+    '''
+    Engine: 见FromMapToObj
+    UseCache: 为True时解析结果缓存在各文件旁的.cache.npz中, 文件未修改时直接读取缓存
+    '''
+    Map = LoadMap(RoadFile, CrossFile, CarFile, UseCache)
+    AnswerFlat, AnswerOffsets = LoadAnswer(AnswerFile, UseCache)
+    return FromMapToObj(Map, AnswerFlat, AnswerOffsets, Engine)
 
-    RoadFile = FileDir + '/road.txt'
-    CrossFile = FileDir + '/cross.txt'
-    CarFile = FileDir + '/car.txt'
-    AnswerFile = FileDir + '/answer.txt'
+def AddCarToGarage(NowTime, CrossObjList, CarObjToStart):
+    for Car in CarObjToStart.PopBatch(NowTime):
+        CrossObjAdd = CrossObjList[Car.StartCross]
+        CrossObjAdd.UnlimitedGarage[Car.StartSlot].append(Car)
+        CrossObjAdd.GarageCarNum += 1
+        CrossObjAdd.ActiveSet.GarageCrosses.add(CrossObjAdd.CrossIdx)
+
+
+# 道路内行驶阶段: 将工作表中每条道路上能更新为终止状态的车辆都更新为终止状态
+def UpdateAllRoads(RoadObjList, ActiveSet, CarArray=None):
+    if CarArray is not None and CarArray.Vectorized and \
+       sum([RoadObjList[RoadIdx].CarNum for RoadIdx in ActiveSet.Roads]) >= CarArray.VectorizedMinCars:
+        CarArray.UpdateTerminalStateRoads(RoadObjList, ActiveSet.Roads)
+    else:
+        for RoadIdx in ActiveSet.Roads:
+            RoadObj = RoadObjList[RoadIdx]
+            RoadObj.SetAllCarWait()
+            RoadObj.UpdateTerminalStateRoad()
 
-    RoadObjList, CrossObjList, CarObjToStart, CarObjHasEnd = FromFileToObj(RoadFile, CrossFile, CarFile, AnswerFile)
-    CarNum = len(CarObjToStart)
-    NowTime = 0
+# 路口调度阶段: 反复调度有等待车辆的路口, 直到所有车辆进入终止状态或发生死锁
+def ScheduleAllCrosses(RoadObjList, CrossObjList, CarObjHasEnd, ActiveSet):
     '''
-    for CrossObj in CrossObjList:
-        print(CrossObj.EntranceRoads)
+    死锁时抛出DeadLockError, 两种判定发生在同一个时间片:
+    1. 等待图中出现环时立即抛出, 信息中包含环上的道路, 车道与车辆
+    2. 一轮调度中没有车辆行驶且仍有路口被阻塞
     '''
-    t0 = time.time()
-    while(len(CarObjHasEnd) < CarNum):
-        # print('NowTime', NowTime)
+    # 路口按index顺序调度, 每一轮只保留仍有车辆被阻塞的路口
+    NeedScheduleCross = [CrossObjList[CrossIdx] for CrossIdx in sorted(ActiveSet.Crosses)]
+    ActiveSet.Crosses.clear()
+    WaitForGraph = ActiveSet.WaitForGraph
+    WaitForGraph.Clear()
+    # 空闲路口在第一轮调度中会直接完成调度并使LockCheckSymbol为False, 这里保持相同的死锁判定
+    FirstRound = len(NeedScheduleCross) < len(CrossObjList)
+    while(len(NeedScheduleCross)):
+        LockCheckSymbol = not FirstRound
+        FirstRound = False
+        for CrossObj in NeedScheduleCross:
+            LockCheckSymbol = CrossObj.ScheduleRoads(RoadObjList, CarObjHasEnd, LockCheckSymbol) and LockCheckSymbol
+            if WaitForGraph.Cycle is not None:
+                RaiseCycleDeadLock(RoadObjList, CrossObjList, WaitForGraph.Cycle)
+        NeedScheduleCross = [CrossObj for CrossObj in NeedScheduleCross if CrossObj.WaitSchedule]
+
+        if LockCheckSymbol:
+            DeadLockCross = [CrossObj.CrossNum for CrossObj in NeedScheduleCross]
+            raise DeadLockError(DeadLockCross)
+
+# 将等待图中的环转换为道路与路口编号后抛出死锁异常, 死锁路口为环上各道路的终点路口
+def RaiseCycleDeadLock(RoadObjList, CrossObjList, Cycle):
+    LockedCrosses = sorted(set([RoadObjList[Block[0]].ToCross for Block in Cycle]))
+    Cycle = [(RoadObjList[Road].RoadNum, Channel, Car, RoadObjList[NextRoad].RoadNum, NextChannel, BlockCar) \
+             for Road, Channel, Car, NextRoad, NextChannel, BlockCar in Cycle]
+    raise DeadLockError([CrossObjList[CrossIdx].CrossNum for CrossIdx in LockedCrosses], Cycle)
+
+# 车库上路阶段: 到达出发时间的车辆进入车库, 车库中的车辆尝试驶入道路
+def AddAllCarsFromGarage(NowTime, RoadObjList, CrossObjList, CarObjToStart, ActiveSet, CarArray=None):
+    if CarArray is None:
+        AddCarToGarage(NowTime, CrossObjList, CarObjToStart)
+    else:
+        CarArray.AddCarToGarage(NowTime, CrossObjList, CarObjToStart)
+    for CrossIdx in list(ActiveSet.GarageCrosses):
+        CrossObjList[CrossIdx].AddCarFromGarage(RoadObjList)
 
-        for CrossObj in CrossObjList:
-            CrossObj.WaitSchedule = True
+# 执行一个时间片的调度: 道路内行驶 -> 路口调度 -> 车库上路
+def UpdateOneTick(NowTime, RoadObjList, CrossObjList, CarObjToStart, CarObjHasEnd, ActiveSet, CarArray=None):
+    '''
+    只访问工作表中的道路与路口, 结果与逐个遍历全部道路和路口完全一致
+    ActiveSet: 调度工作表, 由RoadClass与CrossClass在车辆驶入, 驶离以及阻塞时维护
+    CarArray: 数组模式下的车辆状态, 对象模式下为None
+    '''
+    UpdateAllRoads(RoadObjList, ActiveSet, CarArray)
+    ScheduleAllCrosses(RoadObjList, CrossObjList, CarObjHasEnd, ActiveSet)
+    AddAllCarsFromGarage(NowTime, RoadObjList, CrossObjList, CarObjToStart, ActiveSet, CarArray)
+
+# 运行调度直到所有车辆到达终点, 返回总调度时间
+def RunSimulation(RoadObjList, CrossObjList, CarObjToStart, CarObjHasEnd, ActiveSet, CarArray=None,
+                  EventDriven=True, ArriveTimes=None, ProgressInterval=None, NowTime=0, StopTime=None,
+                  Instrument=None):
+    '''
+    EventDriven: 为True时, 路网中没有任何车辆(道路与车库均为空)时直接跳到下一辆车的出发时间
+    ArriveTimes: 不为None时为一个列表, 按顺序追加本次调用中到达终点的车辆的到达时间,
+                 与总调度时间的计法相同, 最后到达车辆的到达时间即为总调度时间
+    ProgressInterval: 不为None时每隔ProgressInterval秒输出一次当前时间片, 已到达车辆数与每秒调度的时间片数,
+                      为0时每个时间片都输出
+    NowTime: 开始运行的时间片, 从快照恢复后继续调度时使用
+    StopTime: 不为None时运行到该时间片之前暂停并返回StopTime, 此时可以保存快照
+    Instrument: 不为None时为Instrument.InstrumentClass, 记录每个时间片各阶段的耗时与事件计数
+    CarObjHasEnd可以是ResultSink.ResultSinkClass, 此时每个时间片结束时将到达的车辆写出并丢弃,
+    事件驱动跳过的时间片同样记录在其每个时间片的统计中
+    '''
+    Tick = Instrument.UpdateOneTick if Instrument is not None else UpdateOneTick
+    ResultSink = CarObjHasEnd if isinstance(CarObjHasEnd, ResultSinkClass) else None
+    CarNum = len(CarObjToStart) + len(CarObjHasEnd) + sum([RoadObj.CarNum for RoadObj in RoadObjList]) + \
+             sum([CrossObj.GarageCarNum for CrossObj in CrossObjList])
+    EndNum = len(CarObjHasEnd)
+    tReport, TickReport = time.time(), NowTime
+    # 插桩在本次运行开始时替换方法, 运行结束(包括暂停与死锁)时恢复
+    if Instrument is not None:
+        Instrument.Attach(RoadObjList, CrossObjList, ActiveSet)
+    try:
+        while(len(CarObjHasEnd) < CarNum):
+            if StopTime is not None and NowTime >= StopTime:
+                return StopTime
+            # 已出发车辆全部到达终点, 中间的空时间片不会改变任何状态
+            if EventDriven and len(CarObjToStart) + len(CarObjHasEnd) == CarNum:
+                SkipTo = max(NowTime, CarObjToStart.NextStartTime())
+                if ResultSink is not None:
+                    ResultSink.SkipTicks(NowTime, SkipTo if StopTime is None else min(SkipTo, StopTime))
+                NowTime = SkipTo
+                if StopTime is not None and NowTime >= StopTime:
+                    return StopTime
+
+            try:
+                Tick(NowTime, RoadObjList, CrossObjList, CarObjToStart, CarObjHasEnd, ActiveSet, CarArray)
+            except DeadLockError as e:
+                e.NowTime = NowTime
+                raise
+            NowTime += 1
+            if ArriveTimes is not None:
+                ArriveTimes.extend([NowTime] * (len(CarObjHasEnd) - EndNum))
+                EndNum = len(CarObjHasEnd)
+            if ResultSink is not None:
+                ResultSink.EndTick(NowTime, CarNum, CarObjToStart, CrossObjList, ActiveSet)
+            if ProgressInterval is not None and time.time() - tReport >= ProgressInterval:
+                tNow = time.time()
+                print('NowTime: %d, Arrived: %d/%d, %.0f ticks/s' % (NowTime, len(CarObjHasEnd), CarNum,
+                                                                     (NowTime - TickReport) / max(tNow - tReport, 1e-9)))
+                tReport, TickReport = tNow, NowTime
+        return NowTime
+    finally:
+        if Instrument is not None:
+            Instrument.Detach()
 
-        for RoadObj in RoadObjList:
-            RoadObj.SetAllCarWait()
-            RoadObj.UpdateTerminalStateRoad()
 
-        NeedScheduleCrossNum = len(CrossObjList)
-        while(NeedScheduleCrossNum):
-            # print(NeedScheduleCrossNum)
-            LockCheckSymbol = True
-            NeedScheduleCrossNum = 0
-            # print('sb')
-            for CrossObj in CrossObjList:
-                if CrossObj.WaitSchedule == True:
-                    LockCheckSymbol = CrossObj.ScheduleRoads(RoadObjList, CarObjHasEnd, LockCheckSymbol) and LockCheckSymbol
-                    NeedScheduleCrossNum += int(CrossObj.WaitSchedule)
-
-                # print(LockCheckSymbol)
-            if LockCheckSymbol:
-                DeadLockCross = []
-                for CrossIdx, CrossObj in enumerate(CrossObjList):
-                    if CrossObj.WaitSchedule == True:
-                        DeadLockCross.append(CrossObj.CrossNum)
-                # print(LockCheckSymbol)
-                raise Exception('ErrorDeadLock, The locked crosses are: ' + str(DeadLockCross))
+if __name__ == '__main__':
 
-        AddCarToGarage(NowTime, CrossObjList, CarObjToStart)
-        for CrossObj in CrossObjList:
-            CrossObj.AddCarFromGarage(RoadObjList)
-        # print(len(CarObjHasEnd))
-        NowTime += 1
-        print(NowTime, len(CarObjHasEnd))
-    t1 = time.time()
-    print(NowTime)
-    print(t1 - t0)
-
-    
+    # 命令行入口见Simulator.py, 例: python Simulation.py config_5 --engine array --progress 1
+    from Simulator import Main
+    Main()
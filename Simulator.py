@@ -0,0 +1,189 @@
+# coding=utf-8
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from Loader import LoadAnswer, AnswerFromRows
+from ResultSink import ResultSinkClass
+from Simulation import DeadLockError, MapClass, LoadMap, FromMapToObj, RunSimulation
+
+# 可嵌入其它程序的调度器: 地图只构建一次, 每次Load一份Answer后用Step, RunUntil或Run推进调度
+class SimulatorClass(object):
+    def __init__(self, Map, Engine='object', OnArrive=None, OnDeadLock=None, EventDriven=True, Instrument=None,
+                 ProgressInterval=None):
+        '''
+        Map: MapClass, 由FromDir或FromArrays构建, 多次Load时共用
+        Engine: 见Simulation.FromMapToObj
+        OnArrive: 不为None时为函数OnArrive(CarId, ArriveTime, TravelTime), 在Step, RunUntil与Run返回前
+                  按到达顺序对期间到达的每辆车调用一次, 到达时间的计法与RunSimulation的ArriveTimes相同
+        OnDeadLock: 不为None时为函数OnDeadLock(Error), 发生死锁时调用并停止调度, 不再抛出DeadLockError;
+                    为None时DeadLockError照常抛出
+        EventDriven, Instrument, ProgressInterval: 见Simulation.RunSimulation
+        '''
+        self.Map = Map
+        self.Engine = Engine
+        self.OnArrive = OnArrive
+        self.OnDeadLock = OnDeadLock
+        self.EventDriven = EventDriven
+        self.Instrument = Instrument
+        self.ProgressInterval = ProgressInterval
+        self.State = None
+        self.NowTime = 0
+        self.DeadLock = None
+        self.ArriveTimes = []
+
+    # 由地图目录中的road.txt, cross.txt与car.txt构建
+    @classmethod
+    def FromDir(cls, FileDir, UseCache=True, **Options):
+        '''
+        Options: 传给SimulatorClass的其它参数
+        '''
+        return cls(LoadMap(FileDir + '/road.txt', FileDir + '/cross.txt', FileDir + '/car.txt', UseCache), **Options)
+
+    # 由内存中的表格构建, 每个表格的行与对应文件中的元组相同
+    @classmethod
+    def FromArrays(cls, RoadTable, CrossTable, CarTable, **Options):
+        return cls(MapClass(np.asarray(RoadTable).tolist(), np.asarray(CrossTable).tolist(),
+                            np.asarray(CarTable, np.int64)), **Options)
+
+    # 载入一份Answer并重置调度状态
+    def Load(self, Answer, ResultSink=None):
+        '''
+        Answer: answer文件路径; LoadAnswer返回的(AnswerFlat, AnswerOffsets); 或行列表, 每行为(carID, StartTime, RoadID...)
+        ResultSink: 不为None时为ResultSink.ResultSinkClass, 代替CarObjHasEnd保存到达的车辆, 此时不能使用OnArrive;
+                    到达时间只写入ResultSink的文件, 不记录在ArriveTimes中, 内存占用不随已到达车辆数增长
+        '''
+        if isinstance(Answer, str):
+            AnswerFlat, AnswerOffsets = LoadAnswer(Answer)
+        elif isinstance(Answer, tuple) and len(Answer) == 2 and isinstance(Answer[0], np.ndarray):
+            AnswerFlat, AnswerOffsets = Answer
+        else:
+            AnswerFlat, AnswerOffsets = AnswerFromRows(Answer)
+        if ResultSink is not None and self.OnArrive is not None:
+            raise ValueError('OnArrive needs the arrived cars, which a ResultSink does not keep')
+        self.State = list(FromMapToObj(self.Map, AnswerFlat, AnswerOffsets, self.Engine))
+        if ResultSink is not None:
+            ResultSink.CarArray = self.State[5]
+            self.State[3] = ResultSink
+        self.NowTime = 0
+        self.DeadLock = None
+        self.ArriveTimes = []
+        return self
+
+    # 所有车辆到达终点或发生死锁时调度结束
+    @property
+    def Finished(self):
+        return self.DeadLock is not None or len(self.State[3]) == len(self.Map.CarTable)
+
+    # 已到达终点的车辆数
+    @property
+    def Arrived(self):
+        return len(self.State[3])
+
+    # 已到达车辆的行驶时间之和, 每辆车为到达时间减去Answer中的出发时间
+    def TotalTravelTime(self):
+        CarObjHasEnd, CarArray = self.State[3], self.State[5]
+        if hasattr(CarObjHasEnd, 'TotalTravelTime'):
+            return CarObjHasEnd.TotalTravelTime
+        return sum(self.ArriveTimes) - sum(self.StartTimes(CarObjHasEnd[:len(self.ArriveTimes)], CarArray))
+
+    @staticmethod
+    def StartTimes(Cars, CarArray):
+        if CarArray is None:
+            return [Car.StartTime for Car in Cars]
+        return CarArray.StartTime[Cars].tolist()
+
+    # 调度到时间片Time之前, 返回当前时间片; 所有车辆提前到达时在最后到达的时间片停止
+    def RunUntil(self, Time=None):
+        '''
+        Time: 为None时一直运行到所有车辆到达终点
+        '''
+        if self.State is None:
+            raise RuntimeError('Load an answer before running')
+        if self.Finished or (Time is not None and Time <= self.NowTime):
+            return self.NowTime
+        EndNum = len(self.ArriveTimes)
+        # 使用ResultSink时行驶时间之和由ResultSink累计, 不再保存每辆车的到达时间
+        ArriveTimes = None if isinstance(self.State[3], ResultSinkClass) else self.ArriveTimes
+        try:
+            self.NowTime = RunSimulation(*self.State, EventDriven=self.EventDriven, ArriveTimes=ArriveTimes,
+                                         ProgressInterval=self.ProgressInterval, NowTime=self.NowTime, StopTime=Time,
+                                         Instrument=self.Instrument)
+        except DeadLockError as e:
+            self.NowTime, self.DeadLock = e.NowTime, e
+            if self.OnDeadLock is None:
+                raise
+        finally:
+            if self.OnArrive is not None:
+                self.CallOnArrive(EndNum)
+        if self.DeadLock is not None:
+            self.OnDeadLock(self.DeadLock)
+        return self.NowTime
+
+    def CallOnArrive(self, EndNum):
+        CarObjHasEnd, CarArray = self.State[3], self.State[5]
+        Cars = CarObjHasEnd[EndNum:len(self.ArriveTimes)]
+        CarIds = [Car.Number for Car in Cars] if CarArray is None else CarArray.Number[Cars].tolist()
+        for CarId, StartTime, ArriveTime in zip(CarIds, self.StartTimes(Cars, CarArray), self.ArriveTimes[EndNum:]):
+            self.OnArrive(CarId, ArriveTime, ArriveTime - StartTime)
+
+    # 调度一个时间片
+    def Step(self):
+        return self.RunUntil(self.NowTime + 1)
+
+    # 一直调度到所有车辆到达终点, 返回总调度时间; 死锁且设置了OnDeadLock时返回死锁的时间片
+    def Run(self):
+        return self.RunUntil(None)
+
+def Main(Args=None):
+    # 例: python Simulator.py config_5 --engine array --profile trace.csv
+    Parser = argparse.ArgumentParser(description='Run the traffic simulation on one map directory')
+    Parser.add_argument('FileDir', help='directory containing road.txt, cross.txt and car.txt')
+    Parser.add_argument('--answer', default=None, help='answer file, default FileDir/answer.txt')
+    Parser.add_argument('--engine', default='object', choices=['object', 'array'])
+    Parser.add_argument('--progress', type=float, default=None, metavar='SECONDS',
+                        help='print progress every SECONDS seconds')
+    Parser.add_argument('--profile', default=None, metavar='TRACE',
+                        help='record per-tick phase times and counters to TRACE (.csv or .jsonl) and print a summary')
+    Parser.add_argument('--result', default=None, metavar='FILE',
+                        help='stream arrived cars to FILE (.csv or .bin) instead of keeping them in memory')
+    Parser.add_argument('--ticks', default=None, metavar='FILE', help='with --result, also write per-tick counts')
+    Parser.add_argument('--no-cache', action='store_true', help='parse the text files instead of the npz cache')
+    Args = Parser.parse_args(Args)
+    if Args.ticks is not None and Args.result is None:
+        Parser.error('--ticks requires --result')
+
+    tLoad = time.time()
+    Instrument = None
+    if Args.profile is not None:
+        from Instrument import InstrumentClass
+        Instrument = InstrumentClass(Args.profile)
+    ResultSink = None
+    if Args.result is not None:
+        ResultSink = ResultSinkClass(Args.result, Args.ticks)
+    Simulator = SimulatorClass.FromDir(Args.FileDir, not Args.no_cache, Engine=Args.engine,
+                                       OnDeadLock=lambda e: print(e), Instrument=Instrument,
+                                       ProgressInterval=Args.progress)
+    Simulator.Load(LoadAnswer(Args.answer or Args.FileDir + '/answer.txt', not Args.no_cache), ResultSink)
+    t0 = time.time()
+    Simulator.Run()
+    t1 = time.time()
+    if ResultSink is not None:
+        ResultSink.Close()
+    print('ScheduleTime: %d%s' % (Simulator.NowTime, ' (DeadLock)' if Simulator.DeadLock is not None else ''))
+    print('TotalTravelTime: %d' % Simulator.TotalTravelTime())
+    print('MapTime: %.3fs, RunTime: %.3fs, TickTime: %.1fus' % (t0 - tLoad, t1 - t0,
+                                                                (t1 - t0) / max(Simulator.NowTime, 1) * 1e6))
+    if Instrument is not None:
+        Instrument.Close()
+        print(Instrument.Summary())
+    # 死锁时以非0状态退出, 与直接抛出DeadLockError时一样可以由调用的脚本判断
+    if Simulator.DeadLock is not None:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+
+    Main()
@@ -0,0 +1,190 @@
+# coding=utf-8
+import numpy as np
+
+from Loader import AnswerFromRows
+from Simulation import CarClass, DepartureQueueClass, FromMapToObj
+
+# 快照格式版本, 保存的内容变化时递增
+SnapshotVersion = 1
+
+# 快照中每辆车的状态数组, 车辆按car.txt中的顺序排列
+CarStateKeys = ['IfWait', 'Position', 'RoutePosition', 'NextRoad']
+
+# 将若干组车辆拼接为一维数组, 第i组为Flat[Offsets[i]:Offsets[i + 1]]
+def GroupsToFlat(Groups, CarToIdx):
+    Offsets = np.zeros(len(Groups) + 1, np.int64)
+    Offsets[1:] = np.cumsum([len(Group) for Group in Groups])
+    Flat = np.array([CarToIdx(Car) for Group in Groups for Car in Group], np.int64)
+    return Flat, Offsets
+
+# 由车辆编号, 出发时间与路线(道路index)生成与LoadAnswer格式相同的Answer
+def RouteToAnswer(Map, Number, StartTime, RouteFlat, RouteOffsets):
+    RoadIdxToId = np.array([RoadDir[0][0] for RoadDir in Map.RoadDirList], np.int64)
+    CarNum = len(Number)
+    AnswerOffsets = RouteOffsets + 2 * np.arange(CarNum + 1)
+    AnswerFlat = np.zeros(AnswerOffsets[-1], np.int64)
+    AnswerFlat[AnswerOffsets[:-1]] = Number
+    AnswerFlat[AnswerOffsets[:-1] + 1] = StartTime
+    IsRoute = np.ones(len(AnswerFlat), np.bool_)
+    IsRoute[AnswerOffsets[:-1]] = False
+    IsRoute[AnswerOffsets[:-1] + 1] = False
+    AnswerFlat[IsRoute] = RoadIdxToId[RouteFlat]
+    return AnswerFlat, AnswerOffsets
+
+def CheckMap(Map, Snapshot):
+    MapShape = np.array([len(Map.RoadDirList), len(Map.CrossList), len(Map.CarTable)], np.int64)
+    if int(Snapshot['Version']) != SnapshotVersion or not np.array_equal(Snapshot['MapShape'], MapShape):
+        raise ValueError('Snapshot does not match this map or version')
+
+# 保存调度状态的快照, 所有内容均为一维NumPy数组, 不包含任何对象
+def TakeSnapshot(Map, NowTime, RoadObjList, CrossObjList, CarObjToStart, CarObjHasEnd, ActiveSet, CarArray=None):
+    '''
+    必须在两个时间片之间调用, NowTime为下一个要运行的时间片(RunSimulation的StopTime或返回值)
+    两个时间片之间所有道路的WaitChannels为空, 路口的优先级表在调度时重新计算, 因此不需要保存
+    返回值: 字典, 各项为
+    NowTime, Version, MapShape: 时间片, 快照版本以及(有向道路数, 路口数, 车辆数)
+    AnswerFlat, AnswerOffsets: 当前使用的Answer, 格式与LoadAnswer相同
+    IfWait, Position, RoutePosition, NextRoad: 每辆车的状态
+    ChannelCars, ChannelOffsets: 按道路index与车道号排列的所有车道中的车辆index, 车道内从后往前
+    GarageCars, GarageOffsets: 按路口index与入口道路排列的所有车库中的车辆index, 按出库顺序
+    DepartureCars: 出发队列中的车辆index, 按出发顺序
+    FinishedCars: 已到达终点的车辆index, 按到达顺序
+    '''
+    ChannelList = [Channel for RoadObj in RoadObjList for Channel in RoadObj.Cars]
+    GarageList = [Garage for CrossObj in CrossObjList for Garage in CrossObj.UnlimitedGarage]
+    DepartureList = [Car for _, Batch in CarObjToStart.Batches for Car in Batch]
+
+    if CarArray is None:
+        CarNumberToIdx = dict(zip(Map.CarTable[:, 0].tolist(), range(len(Map.CarTable))))
+        CarToIdx = lambda Car: CarNumberToIdx[Car.Number]
+        CarByIdx = [None] * len(Map.CarTable)
+        for Group in ChannelList + GarageList + [DepartureList, CarObjHasEnd]:
+            for Car in Group:
+                CarByIdx[CarToIdx(Car)] = Car
+        CarState = dict([(Key, np.array([getattr(Car, Key) for Car in CarByIdx])) for Key in CarStateKeys])
+        Number = np.array([Car.Number for Car in CarByIdx], np.int64)
+        StartTime = np.array([Car.StartTime for Car in CarByIdx], np.int64)
+        RouteFlat, RouteOffsets = GroupsToFlat([Car.Route for Car in CarByIdx], int)
+    else:
+        CarToIdx = int
+        CarState = dict([(Key, getattr(CarArray, Key).copy()) for Key in CarStateKeys])
+        Number, StartTime = CarArray.Number, CarArray.StartTime
+        RouteFlat, RouteOffsets = CarArray.RouteFlat, CarArray.RouteOffsets
+
+    Snapshot = dict(CarState)
+    Snapshot['IfWait'] = Snapshot['IfWait'].astype(np.bool_)
+    Snapshot['NowTime'] = np.array(NowTime, np.int64)
+    Snapshot['Version'] = np.array(SnapshotVersion, np.int64)
+    Snapshot['MapShape'] = np.array([len(Map.RoadDirList), len(Map.CrossList), len(Map.CarTable)], np.int64)
+    Snapshot['AnswerFlat'], Snapshot['AnswerOffsets'] = RouteToAnswer(Map, Number, StartTime, RouteFlat, RouteOffsets)
+    Snapshot['ChannelCars'], Snapshot['ChannelOffsets'] = GroupsToFlat(ChannelList, CarToIdx)
+    Snapshot['GarageCars'], Snapshot['GarageOffsets'] = GroupsToFlat(GarageList, CarToIdx)
+    Snapshot['DepartureCars'] = np.array([CarToIdx(Car) for Car in DepartureList], np.int64)
+    Snapshot['FinishedCars'] = np.array([CarToIdx(Car) for Car in CarObjHasEnd], np.int64)
+    return Snapshot
+
+# 由快照重建调度对象, 快照可以来自另一种Engine
+def RestoreSnapshot(Map, Snapshot, Engine='object'):
+    '''
+    返回值: NowTime以及与FromMapToObj相同的6个调度对象, 以RunSimulation(..., NowTime=NowTime)继续调度
+    '''
+    CheckMap(Map, Snapshot)
+    AnswerFlat, AnswerOffsets = Snapshot['AnswerFlat'], Snapshot['AnswerOffsets']
+    RoadObjList, CrossObjList, CarObjToStart, CarObjHasEnd, ActiveSet, CarArray = FromMapToObj(
+        Map, AnswerFlat, AnswerOffsets, Engine)
+    StartTime = AnswerFlat[AnswerOffsets[:-1] + 1]
+
+    if CarArray is None:
+        # 新建的对象全部在出发队列中, 按车辆编号还原为car.txt中的顺序
+        CarNumberToIdx = dict(zip(Map.CarTable[:, 0].tolist(), range(len(Map.CarTable))))
+        CarByIdx = [None] * len(Map.CarTable)
+        for _, Batch in CarObjToStart.Batches:
+            for Car in Batch:
+                CarByIdx[CarNumberToIdx[Car.Number]] = Car
+        CarState = [Snapshot[Key].tolist() for Key in CarStateKeys]
+        for Car, IfWait, Position, RoutePosition, NextRoad in zip(CarByIdx, *CarState):
+            Car.IfWait, Car.Position, Car.RoutePosition, Car.NextRoad = IfWait, Position, RoutePosition, NextRoad
+    else:
+        CarByIdx = list(range(CarArray.CarNum))
+        for Key in CarStateKeys:
+            getattr(CarArray, Key)[:] = Snapshot[Key]
+        # 入口slot与转向优先级由RoutePosition唯一确定
+        Step = CarArray.RouteOffsets[:-1] + CarArray.RoutePosition
+        CarArray.NextEntranceSlot[:] = CarArray.RouteEntranceSlot[Step]
+        CarArray.NextTurn[:] = CarArray.RouteTurn[Step]
+
+    ChannelCars, ChannelOffsets = Snapshot['ChannelCars'].tolist(), Snapshot['ChannelOffsets'].tolist()
+    ChannelIdx = 0
+    for RoadObj in RoadObjList:
+        for Channel in RoadObj.Cars:
+            Channel.extend([CarByIdx[Car] for Car in ChannelCars[ChannelOffsets[ChannelIdx]:ChannelOffsets[ChannelIdx + 1]]])
+            RoadObj.CarNum += len(Channel)
+            ChannelIdx += 1
+        if RoadObj.CarNum:
+            ActiveSet.Roads.add(RoadObj.RoadIdx)
+
+    GarageCars, GarageOffsets = Snapshot['GarageCars'].tolist(), Snapshot['GarageOffsets'].tolist()
+    GarageIdx = 0
+    for CrossObj in CrossObjList:
+        for Garage in CrossObj.UnlimitedGarage:
+            Garage.extend([CarByIdx[Car] for Car in GarageCars[GarageOffsets[GarageIdx]:GarageOffsets[GarageIdx + 1]]])
+            CrossObj.GarageCarNum += len(Garage)
+            GarageIdx += 1
+        if CrossObj.GarageCarNum:
+            ActiveSet.GarageCrosses.add(CrossObj.CrossIdx)
+
+    DepartureCars = Snapshot['DepartureCars']
+    CarObjToStart = DepartureQueueClass([CarByIdx[Car] for Car in DepartureCars.tolist()], StartTime[DepartureCars])
+    CarObjHasEnd.extend([CarByIdx[Car] for Car in Snapshot['FinishedCars'].tolist()])
+    return int(Snapshot['NowTime']), RoadObjList, CrossObjList, CarObjToStart, CarObjHasEnd, ActiveSet, CarArray
+
+# 由快照派生一个修改了部分车辆Answer的新快照, 原快照不变
+def ForkSnapshot(Map, Snapshot, RouteChanges):
+    '''
+    RouteChanges: 修改后的Answer行, 每个元素为(carID, StartTime, RoadID...)
+                  只能修改仍在出发队列中的车辆, 新的出发时间不能早于快照的NowTime
+    出发队列按新的出发时间重新排序, 排序方式与FromMapToObj相同
+    '''
+    CheckMap(Map, Snapshot)
+    NowTime = int(Snapshot['NowTime'])
+    CarNumberToIdx = dict(zip(Map.CarTable[:, 0].tolist(), range(len(Map.CarTable))))
+    InQueue = np.zeros(len(Map.CarTable), np.bool_)
+    InQueue[Snapshot['DepartureCars']] = True
+
+    AnswerFlat, AnswerOffsets = Snapshot['AnswerFlat'], Snapshot['AnswerOffsets']
+    AnswerRows = [AnswerFlat[AnswerOffsets[CarIdx]:AnswerOffsets[CarIdx + 1]].tolist() \
+                  for CarIdx in range(len(Map.CarTable))]
+    Fork = dict([(Key, Value.copy()) for Key, Value in Snapshot.items()])
+    for Row in RouteChanges:
+        CarIdx = CarNumberToIdx.get(Row[0])
+        if CarIdx is None or not InQueue[CarIdx]:
+            raise ValueError('Car %s has already departed or does not exist' % (Row[0], ))
+        if Row[1] < NowTime:
+            raise ValueError('Car %s cannot start at %d, the snapshot is at %d' % (Row[0], Row[1], NowTime))
+        Car = Map.CarTable[CarIdx].tolist()
+        Route = CarClass.GetRoute(Car, Row, Map.CrossToIdx, Map.CrossRoadToNext, Map.CrossAdjacency)
+        AnswerRows[CarIdx] = list(Row)
+        Fork['NextRoad'][CarIdx] = Route[0]
+
+    Fork['AnswerFlat'], Fork['AnswerOffsets'] = AnswerFromRows(AnswerRows)
+    StartTime = Fork['AnswerFlat'][Fork['AnswerOffsets'][:-1] + 1]
+    Order = StartTime.argsort()
+    Fork['DepartureCars'] = Order[InQueue[Order]]
+    return Fork
+
+# 快照以未压缩的npz格式保存, 数值范围允许时整数数组以int32保存
+def SaveSnapshot(FileName, Snapshot):
+    Arrays = {}
+    for Key, Value in Snapshot.items():
+        if Value.dtype == np.int64 and Value.size and \
+                Value.min() >= np.iinfo(np.int32).min and Value.max() <= np.iinfo(np.int32).max:
+            Value = Value.astype(np.int32)
+        Arrays[Key] = Value
+    with open(FileName, 'wb') as f:
+        np.savez(f, **Arrays)
+
+# 读取快照, 整数数组统一还原为int64, 保证排序等结果与保存前相同
+def LoadSnapshot(FileName):
+    with np.load(FileName) as Data:
+        return dict([(Key, Data[Key] if Data[Key].dtype == np.bool_ else Data[Key].astype(np.int64)) \
+                     for Key in Data.files])